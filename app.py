@@ -1,16 +1,40 @@
-from flask import Flask, render_template_string, request, redirect, url_for, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, WardrobeItem, Outfit, OutfitItem, Laundry, Season, Style, OutfitSuggestion
-from datetime import datetime, timezone
-import random
-import os
+from flask import Blueprint, Flask, abort, current_app, jsonify, render_template, stream_template, request, redirect, send_file, url_for, session
+from jinja2 import DictLoader
+from werkzeug.local import LocalProxy
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from models import db, User, WardrobeItem, Outfit, OutfitItem, Laundry, Season, Style, OutfitSuggestion, LatestSuggestion, DailyOutfit, migrate_schema, insert_ignore, bump_data_version, commit_items_change, read_data_version, read_items_version, read_versions, ITEM_CATEGORIES
+from availability import AvailabilityIndex, AvailableItem
+from importer import IMPORT_FORMATS, ImportResult, decode_lines, detect_format, import_items
+from sampler import OutfitSampler
+from refdata import ReferenceCache, reference_data
+from metrics import Metrics
+from passwords import HasherBusy, PasswordHasher
+from search import search_items
+from media import MEDIA_PREFIX, MediaError, MediaStore
+from suggestions import record_suggestions, prune_suggestions, rebuild_latest, rebuild_rollups, start_pruning
+from precompute import precompute_daily
+from config import Config, engine_options, install_sqlite_pragmas
+import scoring
+from datetime import datetime, timedelta, timezone
+from operator import attrgetter
+import bisect
+import click
+import zlib
 
-app = Flask(__name__)
-app.secret_key = "virtual_wardrobe_secret"
+bp = Blueprint("main", __name__, cli_group=None)
 
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///vdrobe.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
+
+def _extension(name):
+    return LocalProxy(lambda: current_app.extensions[name])
+
+# per-app state: create_app() gives every app its own instances in
+# app.extensions, and these names refer to the current app's
+metrics = _extension("metrics")
+hasher = _extension("password_hasher")
+media = _extension("media")
+availability = _extension("availability")
+sampler = _extension("outfit_sampler")
 
 
 BASE_TEMPLATE = """
@@ -28,8 +52,10 @@ BASE_TEMPLATE = """
             {% if session.get("user_id") %}
                 <a href="/" class="text-gray-600">Builder</a>
                 <a href="/wardrobe" class="text-gray-600">Wardrobe</a>
+                <a href="/search" class="text-gray-600">Search</a>
                 <a href="/laundry" class="text-gray-600">Laundry</a>
                 <a href="/auto" class="text-gray-600">Auto Outfit</a>
+                <a href="/outfits" class="text-gray-600">Outfits</a>
                 <a href="/logout" class="text-red-600 font-semibold">Logout</a>
             {% else %}
                 <a href="/login" class="text-indigo-600 font-semibold">Login</a>
@@ -39,7 +65,7 @@ BASE_TEMPLATE = """
     </div>
 </nav>
 <div class="max-w-6xl mx-auto p-6">
-{{ content | safe }}
+{% block content %}{% endblock %}
 </div>
 </body>
 </html>
@@ -47,6 +73,8 @@ BASE_TEMPLATE = """
 
 
 REGISTER_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <div class="max-w-md mx-auto bg-white p-6 rounded-xl shadow-xl">
 <h2 class="text-2xl font-bold mb-4">Register</h2>
 <form method="POST">
@@ -57,9 +85,12 @@ REGISTER_HTML = """
 </form>
 <p class="mt-3">Already have an account? <a href="/login" class="text-indigo-600">Login</a></p>
 </div>
+{% endblock %}
 """
 
 LOGIN_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <div class="max-w-md mx-auto bg-white p-6 rounded-xl shadow-xl">
 <h2 class="text-2xl font-bold mb-4">Login</h2>
 <form method="POST">
@@ -69,9 +100,12 @@ LOGIN_HTML = """
 </form>
 <p class="mt-3">Don't have an account? <a href="/register" class="text-indigo-600">Register</a></p>
 </div>
+{% endblock %}
 """
 
 INDEX_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <h1 class="text-3xl font-bold mb-6 text-center">Create Your Outfit</h1>
 
 <div class="grid grid-cols-2 gap-6">
@@ -101,12 +135,15 @@ INDEX_HTML = """
         <h2 class="font-semibold text-xl mb-4">Your Wardrobe</h2>
         <div class="grid grid-cols-3 gap-3">
         {% for item in items %}
-            <img src="{{ item.image_url }}"
+            <img src="{{ item.image_url|thumb }}" loading="lazy"
                  class="border rounded-md cursor-pointer wardrobe-item"
                  data-category="{{ item.category }}"
                  data-image="{{ item.image_url }}">
         {% endfor %}
         </div>
+        {% if next_after %}
+        <a href="{{ url_for('.index', after=next_after, **filters) }}" class="block text-center text-indigo-600 mt-4">Next page</a>
+        {% endif %}
     </div>
 
 </div>
@@ -121,20 +158,32 @@ document.querySelectorAll('.wardrobe-item').forEach(item => {
 });
 </script>
 
+{% endblock %}
 """
 
 WARDROBE_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <div class="flex justify-between items-center mb-6">
     <h1 class="text-3xl font-bold">My Wardrobe</h1>
-    <a href="/add" class="bg-indigo-600 text-white px-4 py-2 rounded">Add Item</a>
+    <div class="space-x-2">
+        <form id="bulk-laundry" action="/laundry/bulk" method="POST" class="inline">
+            <button class="bg-yellow-500 text-white px-4 py-2 rounded">Move Selected to Laundry</button>
+        </form>
+        <a href="/import" class="bg-white border border-indigo-600 text-indigo-600 px-4 py-2 rounded">Import</a>
+        <a href="/add" class="bg-indigo-600 text-white px-4 py-2 rounded">Add Item</a>
+    </div>
 </div>
 
 <div class="grid grid-cols-4 gap-4">
 {% for item in items %}
 <div class="bg-white p-3 rounded-lg shadow-md">
-    <img src="{{ item.image_url }}" class="w-full h-40 object-cover rounded-lg">
-    <p class="font-semibold">{{ item.item_name }}</p>
-    <p class="text-gray-600">{{ item.category }} • {{ item.season.season_name if item.season else '' }} • {{ item.style.style_name if item.style else '' }}</p>
+    <img src="{{ item.image_url|thumb }}" loading="lazy" class="w-full h-40 object-cover rounded-lg">
+    <label class="font-semibold block">
+        <input type="checkbox" name="item_ids" value="{{ item.item_id }}" form="bulk-laundry">
+        {{ item.item_name }}
+    </label>
+    <p class="text-gray-600">{{ item.category }} • {{ refdata.season_names.get(item.season_id, '') }} • {{ refdata.style_names.get(item.style_id, '') }}</p>
 
     <a href="/laundry/{{ item.item_id }}" class="mt-2 bg-yellow-500 text-white p-1 rounded block text-center">
         Move to Laundry
@@ -146,13 +195,25 @@ WARDROBE_HTML = """
 </div>
 {% endfor %}
 </div>
+
+{% if next_after %}
+<div class="text-center mt-6">
+    <a href="{{ url_for('.wardrobe', after=next_after, **filters) }}" class="bg-indigo-600 text-white px-4 py-2 rounded">Next page</a>
+</div>
+{% endif %}
+{% endblock %}
 """
 
 ADD_ITEM_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <h1 class="text-3xl font-bold mb-6 text-center">Add New Item</h1>
-<form method="POST" class="max-w-md mx-auto bg-white p-6 rounded-xl shadow-xl">
+<form method="POST" enctype="multipart/form-data" class="max-w-md mx-auto bg-white p-6 rounded-xl shadow-xl">
+    {% if error %}<p class="text-red-600 mb-3">{{ error }}</p>{% endif %}
     <input name="item_name" placeholder="Item Name" class="w-full border p-2 mb-3" required>
-    <input name="image_url" placeholder="Image URL" class="w-full border p-2 mb-3" required>
+    <input name="image_url" placeholder="Image URL" class="w-full border p-2 mb-3">
+    <label class="block mb-1">or upload a photo</label>
+    <input name="image" type="file" accept="image/jpeg,image/png,image/gif,image/webp" class="w-full border p-2 mb-3">
     <select name="category" class="w-full border p-2 mb-3">
         <option value="top">Top</option>
         <option value="bottom">Bottom</option>
@@ -171,26 +232,89 @@ ADD_ITEM_HTML = """
 
     <button class="w-full bg-indigo-600 text-white p-2 rounded-md hover:bg-indigo-700">Add Item</button>
 </form>
+{% endblock %}
+"""
+
+IMPORT_HTML = """
+{% extends "base.html" %}
+{% block content %}
+<h1 class="text-3xl font-bold mb-6 text-center">Import Items</h1>
+<form method="POST" enctype="multipart/form-data" class="max-w-md mx-auto bg-white p-6 rounded-xl shadow-xl">
+    <p class="text-gray-600 mb-3">CSV or JSONL with item_name, category, image_url and optional season/style (name or id).</p>
+    {% if error %}<p class="text-red-600 mb-3">{{ error }}</p>{% endif %}
+    <input name="file" type="file" accept=".csv,.jsonl,.ndjson" class="w-full border p-2 mb-3" required>
+    <select name="format" class="w-full border p-2 mb-3">
+        <option value="">Detect from file name</option>
+        {% for f in formats %}<option value="{{ f }}">{{ f }}</option>{% endfor %}
+    </select>
+    <button class="w-full bg-indigo-600 text-white p-2 rounded-md hover:bg-indigo-700">Import</button>
+</form>
+
+{% if result %}
+<div class="max-w-md mx-auto bg-white p-6 rounded-xl shadow mt-6">
+    <p class="font-semibold">Imported {{ result.imported }} items, {{ result.errors|length }} rows rejected.</p>
+    <ul class="text-red-600 mt-2">
+    {% for line_no, message in result.errors[:100] %}
+        <li>Line {{ line_no }}: {{ message }}</li>
+    {% endfor %}
+    </ul>
+</div>
+{% endif %}
+{% endblock %}
 """
 
 LAUNDRY_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <h2 class="text-2xl font-bold mb-4">Laundry Items</h2>
 {% if items|length == 0 %}
 <p>No items in laundry.</p>
+{% else %}
+<div class="flex flex-wrap gap-2 mb-4">
+    <form id="bulk-restore" action="/restore/bulk" method="POST">
+        <button class="bg-green-600 text-white px-4 py-2 rounded">Restore Selected</button>
+    </form>
+    <form action="/restore/all" method="POST">
+        <button class="bg-green-600 text-white px-4 py-2 rounded">Restore All</button>
+    </form>
+    <form action="/restore/auto" method="POST">
+        <button class="bg-green-600 text-white px-4 py-2 rounded">Restore Older Than</button>
+        <input name="days" type="number" min="0" value="{{ default_days }}" class="w-20 border p-2"> days
+    </form>
+</div>
 {% endif %}
 <div style="display:flex; gap:20px; flex-wrap:wrap;">
 {% for laundry, item in items %}
     <div class="p-4 shadow-md rounded-lg border bg-white" style="width:170px;">
-        <img src="{{ item.image_url }}" width="150" class="rounded mb-2">
-        <p class="font-semibold">{{ item.item_name }}</p>
+        <img src="{{ item.image_url|thumb }}" loading="lazy" width="150" class="rounded mb-2">
+        <label class="font-semibold block">
+            <input type="checkbox" name="item_ids" value="{{ item.item_id }}" form="bulk-restore">
+            {{ item.item_name }}
+        </label>
         <a href="/restore/{{ item.item_id }}" class="block bg-green-600 text-white text-center p-2 rounded mt-2 hover:bg-green-700">Restore</a>
     </div>
 {% endfor %}
 </div>
+{% endblock %}
 """
 
 AUTO_SELECT_HTML = """
+{% extends "base.html" %}
+{% block content %}
 <h2 class="text-2xl font-bold mb-4">Auto Outfit Generator</h2>
+{% if daily %}
+<div class="mb-8 bg-white p-6 rounded-xl shadow">
+    <h3 class="font-bold text-xl mb-4">Outfit of the Day</h3>
+    <div class="flex gap-6">
+    {% for part in ("top", "bottom", "shoes") %}
+        <div class="text-center">
+            <img src="{{ daily[part].image_url|thumb }}" class="w-40 h-40 object-cover rounded shadow">
+            <p class="mt-2">{{ daily[part].item_name }}</p>
+        </div>
+    {% endfor %}
+    </div>
+</div>
+{% endif %}
 <form method="POST">
     <label class="block mb-2">Choose season</label>
     <select name="season_id" class="w-64 border p-2 mb-4">
@@ -204,18 +328,39 @@ AUTO_SELECT_HTML = """
         {% for st in styles %}<option value="{{ st.style_id }}">{{ st.style_name }}</option>{% endfor %}
     </select>
 
+    {% if scoring_available %}
+    <label class="block mb-2">Mode</label>
+    <select name="mode" class="w-64 border p-2 mb-4">
+        <option value="random">Random</option>
+        <option value="best">Best matches</option>
+    </select>
+    {% endif %}
+
+    <label class="block mb-2">How many outfits</label>
+    <input name="count" type="number" min="1" max="{{ max_count }}" value="1" class="w-64 border p-2 mb-4 block">
+
     <button class="bg-indigo-600 text-white p-2 rounded">Generate Outfit</button>
 </form>
 
-{% if suggestion %}
+{% if suggestions %}
+<form id="save-outfits" action="/outfits/save" method="POST" class="mt-10 text-center">
+    <button class="bg-green-600 text-white px-4 py-2 rounded">Save Selected</button>
+    <label class="ml-2"><input type="checkbox" name="favorite" value="1"> as favorites</label>
+</form>
+{% endif %}
+
+{% for suggestion in suggestions %}
 <div class="mt-10 bg-white p-6 rounded-xl shadow max-w-xl mx-auto">
 
-    <h3 class="font-bold text-2xl text-center mb-6">Generated Outfit</h3>
+    <h3 class="font-bold text-2xl text-center mb-6">
+        <label><input type="checkbox" name="suggestion_ids" value="{{ suggestion.suggestion_id }}" form="save-outfits" checked>
+        Generated Outfit</label>
+    </h3>
 
     <!-- TOP SECTION -->
     <div class="mb-6 text-center">
         <h4 class="font-semibold mb-2 text-gray-700">Top</h4>
-        <img src="{{ suggestion.top.image_url }}" 
+        <img src="{{ suggestion.top.image_url|thumb }}" 
              class="w-60 h-60 object-cover rounded mx-auto shadow">
         <p class="mt-2 text-lg font-medium">{{ suggestion.top.item_name }}</p>
     </div>
@@ -223,7 +368,7 @@ AUTO_SELECT_HTML = """
     <!-- BOTTOM SECTION -->
     <div class="mb-6 text-center">
         <h4 class="font-semibold mb-2 text-gray-700">Bottom</h4>
-        <img src="{{ suggestion.bottom.image_url }}" 
+        <img src="{{ suggestion.bottom.image_url|thumb }}" 
              class="w-60 h-60 object-cover rounded mx-auto shadow">
         <p class="mt-2 text-lg font-medium">{{ suggestion.bottom.item_name }}</p>
     </div>
@@ -231,114 +376,599 @@ AUTO_SELECT_HTML = """
     <!-- SHOES SECTION -->
     <div class="mb-6 text-center">
         <h4 class="font-semibold mb-2 text-gray-700">Shoes</h4>
-        <img src="{{ suggestion.shoes.image_url }}" 
+        <img src="{{ suggestion.shoes.image_url|thumb }}" 
              class="w-60 h-60 object-cover rounded mx-auto shadow">
         <p class="mt-2 text-lg font-medium">{{ suggestion.shoes.item_name }}</p>
     </div>
 
 </div>
-{% endif %}
+{% endfor %}
+
+{% endblock %}
+"""
+
+SEARCH_HTML = """
+{% extends "base.html" %}
+{% block content %}
+<h1 class="text-3xl font-bold mb-6">Search</h1>
+<form method="GET" class="flex gap-2 mb-6">
+    <input name="q" value="{{ q }}" placeholder="Item name" class="flex-1 border p-2" autofocus>
+    {% for name, value in filters.items() if value is not none %}
+    <input type="hidden" name="{{ name }}" value="{{ value }}">
+    {% endfor %}
+    <button class="bg-indigo-600 text-white px-4 py-2 rounded">Search</button>
+</form>
+
+<div class="flex gap-6">
+<div class="w-48 shrink-0">
+    {% for facet, param, names in [("category", "category", none), ("season", "season_id", refdata.season_names), ("style", "style_id", refdata.style_names)] %}
+    <h3 class="font-semibold mt-4 capitalize">{{ facet }}</h3>
+    {% if filters[param] is not none %}
+    <a href="{{ url_for('.search', q=q, **dict(filters, **{param: none})) }}" class="text-sm text-indigo-600 block">Any</a>
+    {% endif %}
+    {% for value, count in result.facets[facet].items()|sort(attribute='1', reverse=true) if value is not none %}
+    <a href="{{ url_for('.search', q=q, **dict(filters, **{param: value})) }}"
+       class="text-sm block {{ 'font-bold' if filters[param] == value else 'text-gray-600' }}">
+        {{ names.get(value, value) if names else value }} ({{ count }})
+    </a>
+    {% endfor %}
+    {% endfor %}
+</div>
 
+<div class="flex-1">
+<p class="text-gray-600 mb-4">{{ result.total }} available item{{ '' if result.total == 1 else 's' }}{% if result.total > result.items|length %}, showing the best {{ result.items|length }}{% endif %}</p>
+<div class="grid grid-cols-4 gap-4">
+{% for item in result.items %}
+<div class="bg-white p-3 rounded-lg shadow-md">
+    <img src="{{ item.image_url|thumb }}" loading="lazy" class="w-full h-40 object-cover rounded-lg">
+    <p class="font-semibold">{{ item.item_name }}</p>
+    <p class="text-gray-600">{{ item.category }} • {{ refdata.season_names.get(item.season_id, '') }} • {{ refdata.style_names.get(item.style_id, '') }}</p>
+    <a href="/laundry/{{ item.item_id }}" class="mt-2 bg-yellow-500 text-white p-1 rounded block text-center">
+        Move to Laundry
+    </a>
+</div>
+{% endfor %}
+</div>
+</div>
+</div>
+{% endblock %}
 """
 
+OUTFITS_HTML = """
+{% extends "base.html" %}
+{% block content %}
+<div class="flex justify-between items-center mb-6">
+    <h1 class="text-3xl font-bold">{{ 'Favorite Outfits' if favorites else 'Saved Outfits' }}</h1>
+    <div class="space-x-2">
+        <a href="/outfits" class="{{ 'font-bold' if not favorites else 'text-gray-600' }}">All</a>
+        <a href="/outfits?favorites=1" class="{{ 'font-bold' if favorites else 'text-gray-600' }}">Favorites</a>
+    </div>
+</div>
+{% if not outfits %}
+<p>No saved outfits yet. Generate some on <a href="/auto" class="text-indigo-600">Auto Outfit</a> and save them.</p>
+{% endif %}
+{% for outfit, items in outfits %}
+<div class="bg-white p-4 rounded-lg shadow-md mb-4">
+    <div class="flex justify-between items-center mb-3">
+        <h3 class="font-semibold">{{ outfit.outfit_name or 'Outfit #%d' % outfit.outfit_id }}</h3>
+        <div class="flex gap-2">
+            <form action="/outfits/{{ outfit.outfit_id }}/favorite" method="POST">
+                <button class="{{ 'bg-yellow-400' if outfit.is_favorite else 'bg-gray-200' }} px-3 py-1 rounded">
+                    {{ 'Unfavorite' if outfit.is_favorite else 'Favorite' }}
+                </button>
+            </form>
+            <form action="/outfits/{{ outfit.outfit_id }}/delete" method="POST">
+                <button class="bg-red-600 text-white px-3 py-1 rounded">Delete</button>
+            </form>
+        </div>
+    </div>
+    <div class="flex gap-4">
+    {% for item, in_laundry in items %}
+        <div class="w-40 text-center">
+            <img src="{{ item.image_url|thumb }}" loading="lazy" class="w-40 h-40 object-cover rounded">
+            <p class="text-sm">{{ item.item_name }}</p>
+            {% if in_laundry %}<p class="text-xs text-yellow-600">in laundry</p>{% endif %}
+        </div>
+    {% endfor %}
+    </div>
+</div>
+{% endfor %}
+{% if next_before %}
+<div class="text-center mt-6">
+    <a href="{{ url_for('.outfits', before=next_before, favorites=1 if favorites else none) }}" class="bg-indigo-600 text-white px-4 py-2 rounded">Older</a>
+</div>
+{% endif %}
+{% endblock %}
+"""
+
+# ------------------ Template registry ------------------
+# Pages extend base.html and are compiled once at startup instead of being
+# re-parsed by render_template_string on every request.
+TEMPLATES = {
+    "base.html": BASE_TEMPLATE,
+    "register.html": REGISTER_HTML,
+    "login.html": LOGIN_HTML,
+    "index.html": INDEX_HTML,
+    "wardrobe.html": WARDROBE_HTML,
+    "add_item.html": ADD_ITEM_HTML,
+    "import.html": IMPORT_HTML,
+    "laundry.html": LAUNDRY_HTML,
+    "auto.html": AUTO_SELECT_HTML,
+    "search.html": SEARCH_HTML,
+    "outfits.html": OUTFITS_HTML,
+}
+
+
+@bp.app_template_filter("thumb")
+def thumb_filter(image_url):
+    return media.thumbnail_url(image_url)
+
+
+@bp.app_context_processor
+def inject_reference_data():
+    return {"refdata": reference_data.get()}
+
+
+def render_grid(template_name, items, **context):
+    """Render a page listing items, streaming it when the grid is large."""
+    if len(items) >= current_app.config['TEMPLATE_STREAM_MIN_ITEMS']:
+        return stream_template(template_name, items=items, **context)
+    return render_template(template_name, items=items, **context)
+
 # ------------------ Helper: exclude laundry ------------------
-def get_available_items(user_id, season_id=None, style_id=None):
-    """Return wardrobe items for the user excluding those present in Laundry."""
-    q = WardrobeItem.query.filter(WardrobeItem.user_id == user_id)
+OUTFIT_CATEGORIES = ITEM_CATEGORIES
+MAX_BATCH_OUTFITS = 20
 
+
+def _available_filters(user_id, season_id=None, style_id=None, category=None, after_id=None):
+    """Filter clauses selecting the user's wardrobe items that are not in Laundry."""
     # exclude items present in laundry for this user
     subq = db.session.query(Laundry.item_id).filter_by(user_id=user_id)
-    q = q.filter(~WardrobeItem.item_id.in_(subq))
-
+    filters = [WardrobeItem.user_id == user_id, ~WardrobeItem.item_id.in_(subq)]
     if season_id:
-        q = q.filter(WardrobeItem.season_id == season_id)
+        filters.append(WardrobeItem.season_id == season_id)
     if style_id:
-        q = q.filter(WardrobeItem.style_id == style_id)
-    return q.all()
+        filters.append(WardrobeItem.style_id == style_id)
+    if category:
+        filters.append(WardrobeItem.category == category)
+    if after_id:
+        filters.append(WardrobeItem.item_id > after_id)
+    return filters
+
+
+def _available_rows_query(user_id, season_id=None, style_id=None, category=None, after_id=None):
+    """Column query for AvailableItem rows, ordered by item_id."""
+    return (db.session.query(WardrobeItem.item_id, WardrobeItem.item_name,
+                             WardrobeItem.category, WardrobeItem.image_url,
+                             WardrobeItem.season_id, WardrobeItem.style_id)
+            .filter(*_available_filters(user_id, season_id, style_id, category, after_id))
+            .order_by(WardrobeItem.item_id))
+
+
+def load_available_items(user_id):
+    """Load every available item of the user as AvailableItem rows in one query.
+
+    Only the columns needed to render the grids and pick outfits are loaded.
+    """
+    return [AvailableItem(*row) for row in _available_rows_query(user_id)]
+
+
+def iter_available_items(user_id, season_id=None, style_id=None, category=None, chunk_size=500):
+    """Yield available items from a server-side cursor, chunk_size rows per fetch."""
+    q = (_available_rows_query(user_id, season_id, style_id, category)
+         .execution_options(stream_results=True, yield_per=chunk_size))
+    for row in q:
+        yield AvailableItem(*row)
+
+
+def user_availability(user_id, version=None):
+    """Return the user's availability index entry, current as of their items_version.
+
+    Pass version if the request has already read it; otherwise it is read
+    here with one primary key lookup.
+    """
+    if version is None:
+        version = read_items_version(user_id)
+    return availability.get(user_id, load_available_items, version)
+
+
+def available_items(user_id, category=None, season_id=None, style_id=None, version=None):
+    """Return the user's available items from the in-memory index."""
+    if version is None:
+        version = read_items_version(user_id)
+    return availability.select(user_id, load_available_items, version, category=category,
+                               season_id=season_id, style_id=style_id)
+
+
+def page_available_items(user_id, after_id=None, limit=None, season_id=None, style_id=None, category=None,
+                         version=None):
+    """Return (items, next_after) for one keyset page of the user's available items.
+
+    next_after is the after_id of the following page, or None on the last page.
+    Pages come from the availability index, except for users too large for it,
+    whose pages are read with a keyset query on item_id.
+    """
+    if limit and availability.oversized(user_id):
+        rows = _available_rows_query(user_id, season_id, style_id, category, after_id).limit(limit + 1).all()
+        page = [AvailableItem(*row) for row in rows[:limit]]
+        return page, page[-1].item_id if len(rows) > limit else None
+    items = available_items(user_id, category, season_id, style_id, version)
+    start = bisect.bisect_right(items, after_id, key=attrgetter("item_id")) if after_id else 0
+    end = start + limit if limit else len(items)
+    page = items[start:end]
+    next_after = page[-1].item_id if page and end < len(items) else None
+    return page, next_after
+
+
+def move_items_to_laundry(user_id, item_ids):
+    """Put the user's items into laundry with one INSERT ... SELECT.
+
+    Items that are not the user's or are already in laundry are skipped, and
+    the availability index is updated. Returns the number of laundry entries
+    created.
+    """
+    in_laundry = db.select(Laundry.item_id).where(Laundry.user_id == user_id)
+    rows = (db.select(WardrobeItem.item_id, db.literal(user_id),
+                      db.literal(datetime.now(timezone.utc), db.DateTime))
+            .where(WardrobeItem.user_id == user_id,
+                   WardrobeItem.item_id.in_(item_ids),
+                   WardrobeItem.item_id.not_in(in_laundry)))
+    result = db.session.execute(
+        db.insert(Laundry).from_select(["item_id", "user_id", "added_at"], rows))
+    version = commit_items_change(user_id)
+    availability.discard(user_id, item_ids, version)
+    return result.rowcount
+
+
+def restore_laundry(user_id=None, item_ids=None, older_than=None):
+    """Delete laundry entries with one DELETE statement; returns rows removed.
+
+    user_id=None restores for every user, item_ids=None restores every item
+    and older_than limits it to entries added before that datetime.
+    """
+    clauses = []
+    if user_id is not None:
+        clauses.append(Laundry.user_id == user_id)
+    if item_ids is not None:
+        clauses.append(Laundry.item_id.in_(item_ids))
+    if older_than is not None:
+        clauses.append(Laundry.added_at < older_than)
+    # before the delete, while the affected users can still be found
+    bump_data_version(db.select(Laundry.user_id).where(*clauses).distinct(), items=True)
+    result = db.session.execute(db.delete(Laundry).where(*clauses))
+    db.session.commit()
+    return result.rowcount
+
+
+def _grid_filters():
+    """Category/season/style filters for the item grids from the query string."""
+    return {
+        "category": request.args.get("category") or None,
+        "season_id": request.args.get("season_id", type=int),
+        "style_id": request.args.get("style_id", type=int),
+    }
+
+
+def get_outfit_candidates(user_id, season_id=None, style_id=None, version=None):
+    """Return available items grouped by outfit category."""
+    if version is None:
+        version = read_items_version(user_id)
+    return {category: available_items(user_id, category, season_id, style_id, version)
+            for category in OUTFIT_CATEGORIES}
+
+
+def load_recent_outfits(user_id, limit):
+    """Return the user's last `limit` suggestions as item id triples, oldest first."""
+    rows = (db.session.query(OutfitSuggestion.top_item_id, OutfitSuggestion.bottom_item_id,
+                             OutfitSuggestion.shoes_item_id)
+            .filter(OutfitSuggestion.user_id == user_id)
+            .order_by(OutfitSuggestion.created_at.desc(), OutfitSuggestion.suggestion_id.desc())
+            .limit(limit)
+            .all())
+    return [tuple(row) for row in reversed(rows)]
+
+
+def sample_outfits(user_id, season_id=None, style_id=None, count=1):
+    """Draw up to count (top, bottom, shoes) outfits from the user's available items.
+
+    The sampler's recent-suggestion window is checked against the user's
+    data_version, which every saved or pruned suggestion bumps.
+    """
+    data_version, items_version = read_versions(user_id)
+    entry = user_availability(user_id, items_version)
+
+    def candidates():
+        groups = get_outfit_candidates(user_id, season_id, style_id, items_version)
+        return [groups[category] for category in OUTFIT_CATEGORIES]
+    return sampler.sample(user_id, (season_id, style_id), entry.revision, data_version,
+                          candidates, load_recent_outfits, count=count)
+
+
+def best_outfits(user_id, season_id=None, style_id=None, count=1):
+    """Return the count highest-scoring outfits over all candidate combinations."""
+    data_version, items_version = read_versions(user_id)
+    groups = get_outfit_candidates(user_id, season_id, style_id, items_version)
+    recent_counts = sampler.recent_item_counts(user_id, load_recent_outfits, data_version)
+    outfits = scoring.top_k_outfits(*(groups[c] for c in OUTFIT_CATEGORIES), k=count,
+                                    recent_counts=recent_counts, rng=sampler.rng)
+    sampler.record(user_id, outfits, load_recent_outfits, data_version)
+    return outfits
+
+def get_latest_suggestion(user_id):
+    """Return the user's last suggestion as {"top", "bottom", "shoes"} items, or None.
+
+    The user's LatestSuggestion pointer, the suggestion and its three items are
+    loaded with a single joined query by primary key.
+    """
+    top, bottom, shoes = aliased(WardrobeItem), aliased(WardrobeItem), aliased(WardrobeItem)
+    row = (db.session.query(OutfitSuggestion.suggestion_id, top, bottom, shoes)
+           .select_from(LatestSuggestion)
+           .join(OutfitSuggestion, OutfitSuggestion.suggestion_id == LatestSuggestion.suggestion_id)
+           .outerjoin(top, OutfitSuggestion.top_item_id == top.item_id)
+           .outerjoin(bottom, OutfitSuggestion.bottom_item_id == bottom.item_id)
+           .outerjoin(shoes, OutfitSuggestion.shoes_item_id == shoes.item_id)
+           .filter(LatestSuggestion.user_id == user_id)
+           .first())
+    if row is None:
+        return None
+    return {"top": row[1], "bottom": row[2], "shoes": row[3]}
+
+def get_daily_outfit(user_id, day=None, version=None):
+    """Return the user's precomputed outfit of the day as {"top", "bottom", "shoes"}, or None.
+
+    None as well when one of its items has since gone to the laundry or been
+    deleted; availability is checked against the in-memory index.
+    """
+    day = day or datetime.now(timezone.utc).date()
+    top, bottom, shoes = aliased(WardrobeItem), aliased(WardrobeItem), aliased(WardrobeItem)
+    row = (db.session.query(top, bottom, shoes)
+           .select_from(DailyOutfit)
+           .join(OutfitSuggestion, OutfitSuggestion.suggestion_id == DailyOutfit.suggestion_id)
+           .join(top, OutfitSuggestion.top_item_id == top.item_id)
+           .join(bottom, OutfitSuggestion.bottom_item_id == bottom.item_id)
+           .join(shoes, OutfitSuggestion.shoes_item_id == shoes.item_id)
+           .filter(DailyOutfit.user_id == user_id, DailyOutfit.day == day)
+           .first())
+    if row is None:
+        return None
+    available = user_availability(user_id, version).items
+    if any(item.item_id not in available for item in row):
+        return None
+    return {"top": row[0], "bottom": row[1], "shoes": row[2]}
+
+def save_outfits(user_id, suggestion_ids, favorite=False):
+    """Save the user's suggestions with these ids as Outfits; returns how many were saved."""
+    suggestions = db.session.scalars(
+        db.select(OutfitSuggestion)
+        .where(OutfitSuggestion.user_id == user_id, OutfitSuggestion.suggestion_id.in_(suggestion_ids))
+    ).all()
+    db.session.add_all([
+        Outfit(user_id=user_id, is_favorite=favorite, outfit_items=[
+            OutfitItem(item_id=item_id)
+            for item_id in (s.top_item_id, s.bottom_item_id, s.shoes_item_id) if item_id is not None
+        ])
+        for s in suggestions
+    ])
+    db.session.commit()
+    return len(suggestions)
+
+def page_saved_outfits(user_id, favorites=False, before_id=None, limit=50):
+    """Return ([(outfit, [(item, in_laundry)])], next_before) newest first.
+
+    The page of outfits, their items and the items' laundry state come from
+    one joined query; pass next_before as before_id for the next page.
+    """
+    page = db.select(Outfit.outfit_id).where(Outfit.user_id == user_id)
+    if favorites:
+        page = page.where(Outfit.is_favorite.is_(True))
+    if before_id:
+        page = page.where(Outfit.outfit_id < before_id)
+    page = page.order_by(Outfit.outfit_id.desc()).limit(limit + 1).subquery()
+
+    rows = (db.session.query(Outfit, WardrobeItem, Laundry.id)
+            .join(page, page.c.outfit_id == Outfit.outfit_id)
+            .outerjoin(OutfitItem, OutfitItem.outfit_id == Outfit.outfit_id)
+            .outerjoin(WardrobeItem, WardrobeItem.item_id == OutfitItem.item_id)
+            .outerjoin(Laundry, (Laundry.user_id == user_id) & (Laundry.item_id == WardrobeItem.item_id))
+            .order_by(Outfit.outfit_id.desc(), OutfitItem.id))
+    outfits = []
+    for outfit, item, laundry_id in rows:
+        if not outfits or outfits[-1][0] is not outfit:
+            outfits.append((outfit, []))
+        if item is not None:
+            outfits[-1][1].append((item, laundry_id is not None))
+
+    next_before = None
+    if len(outfits) > limit:
+        outfits = outfits[:limit]
+        next_before = outfits[-1][0].outfit_id
+    return outfits, next_before
 
 # ------------------ ROUTES ------------------
 
-@app.route("/")
+@bp.route("/")
 def index():
     if "user_id" not in session:
         return redirect("/login")
 
     # show last generated suggestion if exists
-    last = OutfitSuggestion.query.filter_by(user_id=session["user_id"]).order_by(OutfitSuggestion.created_at.desc()).first()
-    suggestion = None
-    if last:
-        suggestion = {
-            "top": WardrobeItem.query.get(last.top_item_id) if last.top_item_id else None,
-            "bottom": WardrobeItem.query.get(last.bottom_item_id) if last.bottom_item_id else None,
-            "shoes": WardrobeItem.query.get(last.shoes_item_id) if last.shoes_item_id else None
-        }
+    suggestion = get_latest_suggestion(session["user_id"])
 
-    items = get_available_items(session["user_id"])
-    return render_template_string(BASE_TEMPLATE, title="Outfit Builder", content=render_template_string(INDEX_HTML, items=items, suggestion=suggestion))
+    filters = _grid_filters()
+    items, next_after = page_available_items(session["user_id"], after_id=request.args.get("after", type=int),
+                                             limit=current_app.config['WARDROBE_PAGE_SIZE'], **filters)
+    return render_grid("index.html", items, title="Outfit Builder", suggestion=suggestion,
+                       next_after=next_after, filters=filters)
 
-@app.route("/register", methods=["GET", "POST"])
+@bp.route("/register", methods=["GET", "POST"])
 def register():
     if request.method == "POST":
-        hash_pw = generate_password_hash(request.form["password"])
+        try:
+            hash_pw = hasher.hash(request.form["password"])
+        except HasherBusy:
+            return _hasher_busy()
         user = User(username=request.form["username"], email=request.form["email"], password_hash=hash_pw)
         db.session.add(user)
         db.session.commit()
         return redirect("/login")
-    return render_template_string(BASE_TEMPLATE, title="Register", content=REGISTER_HTML)
+    return render_template("register.html", title="Register")
 
-@app.route("/login", methods=["GET", "POST"])
+@bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
+        password = request.form["password"]
         user = User.query.filter_by(email=request.form["email"]).first()
-        if user and check_password_hash(user.password_hash, request.form["password"]):
+        try:
+            valid = user is not None and hasher.verify(user.password_hash, password)
+        except HasherBusy:
+            return _hasher_busy()
+        if valid:
+            if hasher.needs_rehash(user.password_hash):
+                try:
+                    user.password_hash = hasher.hash(password)
+                    db.session.commit()
+                except HasherBusy:
+                    pass  # upgraded on a later login
             session["user_id"] = user.user_id
             return redirect("/wardrobe")
-    return render_template_string(BASE_TEMPLATE, title="Login", content=LOGIN_HTML)
+    return render_template("login.html", title="Login")
 
-@app.route("/logout")
+def _hasher_busy():
+    return "Too many sign-ins right now, please try again in a moment.", 503, {"Retry-After": "1"}
+
+@bp.route("/logout")
 def logout():
     session.clear()
     return redirect("/login")
 
-@app.route("/wardrobe")
+@bp.route("/wardrobe")
 def wardrobe():
     if "user_id" not in session:
         return redirect("/login")
-    items = get_available_items(session["user_id"])
-    return render_template_string(BASE_TEMPLATE, title="My Wardrobe", content=render_template_string(WARDROBE_HTML, items=items))
+    filters = _grid_filters()
+
+    if request.args.get("stream", type=int):
+        # whole grid straight from the database cursor, without paging
+        items = iter_available_items(session["user_id"], chunk_size=current_app.config['WARDROBE_STREAM_CHUNK'], **filters)
+        return stream_template("wardrobe.html", title="My Wardrobe", items=items, next_after=None, filters=filters)
+
+    items, next_after = page_available_items(session["user_id"], after_id=request.args.get("after", type=int),
+                                             limit=current_app.config['WARDROBE_PAGE_SIZE'], **filters)
+    return render_grid("wardrobe.html", items, title="My Wardrobe", next_after=next_after, filters=filters)
 
-@app.route("/add", methods=["GET", "POST"])
+@bp.route("/add", methods=["GET", "POST"])
 def add_item():
     if "user_id" not in session:
         return redirect("/login")
-    seasons = Season.query.all()
-    styles = Style.query.all()
+    refs = reference_data.get()
 
     if request.method == "POST":
+        image_url = request.form.get("image_url", "").strip()
+        upload = request.files.get("image")
+        error = None
+        if upload and upload.filename:
+            try:
+                image_url = MEDIA_PREFIX + media.save(upload.stream)
+            except MediaError as e:
+                error = str(e)
+        elif not image_url:
+            error = "Give an image URL or upload a photo."
+        if error:
+            return render_template("add_item.html", title="Add Item", seasons=refs.seasons,
+                                   styles=refs.styles, error=error), 400
+
         item = WardrobeItem(
             user_id=session["user_id"],
             item_name=request.form["item_name"],
             category=request.form["category"],
-            image_url=request.form["image_url"],
-            season_id=request.form.get("season_id") or None,
-            style_id=request.form.get("style_id") or None
+            image_url=image_url,
+            season_id=request.form.get("season_id", type=int),
+            style_id=request.form.get("style_id", type=int)
         )
         db.session.add(item)
-        db.session.commit()
+        version = commit_items_change(item.user_id)
+        availability.add(item.user_id, AvailableItem(
+            item.item_id, item.item_name, item.category, item.image_url,
+            item.season_id, item.style_id
+        ), version)
         return redirect("/wardrobe")
-    return render_template_string(BASE_TEMPLATE, title="Add Item", content=render_template_string(ADD_ITEM_HTML, seasons=seasons, styles=styles))
+    return render_template("add_item.html", title="Add Item", seasons=refs.seasons, styles=refs.styles)
+
+@bp.route("/import", methods=["GET", "POST"])
+def import_wardrobe():
+    if "user_id" not in session:
+        return redirect("/login")
+    result = None
+
+    if request.method == "POST":
+        upload = request.files["file"]
+        fmt = request.form.get("format") or detect_format(upload.filename)
+        if fmt not in IMPORT_FORMATS:
+            return render_template("import.html", title="Import Items", formats=IMPORT_FORMATS,
+                                   error="Unknown format: %s" % fmt), 400
+        result = ImportResult()
+        try:
+            import_items(session["user_id"], decode_lines(upload.stream), fmt, result=result)
+        finally:
+            # batches commit as they go, so some rows may be in even on failure
+            if result.imported:
+                availability.invalidate(session["user_id"])
+    return render_template("import.html", title="Import Items", formats=IMPORT_FORMATS, result=result)
+
+@bp.route("/media/<name>")
+def media_original(name):
+    try:
+        path = media.original_path(name)
+    except MediaError:
+        abort(404)
+    return _send_media(path, name, current_app.config['MEDIA_MAX_AGE'])
+
+@bp.route("/media/thumb/<size>/<name>")
+def media_thumbnail(size, name):
+    if size != media.thumbnail_size_name:
+        # a page rendered before THUMBNAIL_SIZE changed; the thumbnail of the
+        # current size has another URL, so this answer must not be cached
+        return redirect(media.thumbnail_url(MEDIA_PREFIX + name))
+    try:
+        path = media.thumbnail(name)
+    except MediaError:
+        abort(404)
+    if path is None:
+        # not made yet: serve the original without caching so the browser asks again
+        return _send_media(media.original_path(name), name, 0)
+    return _send_media(path, "thumb-%s-%s" % (size, name), current_app.config['MEDIA_MAX_AGE'])
+
+def _send_media(path, etag, max_age):
+    try:
+        response = send_file(path, max_age=max_age, etag=etag, conditional=True)
+    except FileNotFoundError:
+        abort(404)
+    if max_age:
+        response.cache_control.immutable = True
+    return response
+
+@bp.route("/search")
+def search():
+    if "user_id" not in session:
+        return redirect("/login")
+    q = request.args.get("q", "").strip()
+    filters = _grid_filters()
+    result = search_items(session["user_id"], q, limit=current_app.config['SEARCH_RESULTS_LIMIT'], **filters)
+    return render_template("search.html", title="Search", q=q, filters=filters, result=result)
 
-@app.route("/delete/<int:item_id>", methods=["POST"])
+@bp.route("/delete/<int:item_id>", methods=["POST"])
 def delete_item(item_id):
     item = WardrobeItem.query.get(item_id)
     if item:
+        user_id = item.user_id
         # also delete any laundry entries pointing to it
         Laundry.query.filter_by(item_id=item_id).delete()
         db.session.delete(item)
-        db.session.commit()
+        version = commit_items_change(user_id)
+        availability.discard(user_id, [item_id], version)
     return redirect("/wardrobe")
 
-@app.route("/laundry")
+@bp.route("/laundry")
 def laundry():
     if "user_id" not in session:
         return redirect("/login")
@@ -346,90 +976,353 @@ def laundry():
              .join(WardrobeItem, Laundry.item_id == WardrobeItem.item_id)
              .filter(Laundry.user_id == session["user_id"])
              .all())
-    return render_template_string(BASE_TEMPLATE, title="Laundry", content=render_template_string(LAUNDRY_HTML, items=items))
+    return render_grid("laundry.html", items, title="Laundry", default_days=current_app.config['LAUNDRY_AUTO_RESTORE_DAYS'])
 
-@app.route("/laundry/<int:item_id>")
+@bp.route("/laundry/<int:item_id>")
 def move_to_laundry(item_id):
     if "user_id" not in session:
         return redirect("/login")
-    # create laundry entry if not exists
-    exists = Laundry.query.filter_by(item_id=item_id, user_id=session["user_id"]).first()
-    if not exists:
-        entry = Laundry(item_id=item_id, user_id=session["user_id"])
-        db.session.add(entry)
-        db.session.commit()
+    # create laundry entry; the unique (user_id, item_id) index rejects duplicates
+    db.session.add(Laundry(item_id=item_id, user_id=session["user_id"]))
+    try:
+        version = commit_items_change(session["user_id"])
+    except IntegrityError:
+        db.session.rollback()
+    else:
+        availability.discard(session["user_id"], [item_id], version)
+    return redirect("/wardrobe")
+
+@bp.route("/laundry/bulk", methods=["POST"])
+def move_selected_to_laundry():
+    if "user_id" not in session:
+        return redirect("/login")
+    item_ids = request.form.getlist("item_ids", type=int)
+    if item_ids:
+        move_items_to_laundry(session["user_id"], item_ids)
     return redirect("/wardrobe")
 
-@app.route("/restore/<int:item_id>")
+@bp.route("/restore/<int:item_id>")
 def restore(item_id):
     if "user_id" not in session:
         return redirect("/login")
-    entry = Laundry.query.filter_by(item_id=item_id, user_id=session["user_id"]).first()
-    if entry:
-        db.session.delete(entry)
-        db.session.commit()
+    if restore_laundry(session["user_id"], item_ids=[item_id]):
+        availability.invalidate(session["user_id"])
+    return redirect("/laundry")
+
+@bp.route("/restore/bulk", methods=["POST"])
+def restore_selected():
+    if "user_id" not in session:
+        return redirect("/login")
+    item_ids = request.form.getlist("item_ids", type=int)
+    if item_ids and restore_laundry(session["user_id"], item_ids=item_ids):
+        availability.invalidate(session["user_id"])
     return redirect("/laundry")
 
-@app.route("/auto", methods=["GET", "POST"])
+@bp.route("/restore/all", methods=["POST"])
+def restore_all():
+    if "user_id" not in session:
+        return redirect("/login")
+    if restore_laundry(session["user_id"]):
+        availability.invalidate(session["user_id"])
+    return redirect("/laundry")
+
+@bp.route("/restore/auto", methods=["POST"])
+def restore_older():
+    if "user_id" not in session:
+        return redirect("/login")
+    days = request.form.get("days", current_app.config['LAUNDRY_AUTO_RESTORE_DAYS'], type=int)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=max(days, 0))
+    if restore_laundry(session["user_id"], older_than=cutoff):
+        availability.invalidate(session["user_id"])
+    return redirect("/laundry")
+
+@bp.route("/auto", methods=["GET", "POST"])
 def auto_outfit():
     if "user_id" not in session:
         return redirect("/login")
-    seasons = Season.query.all()
-    styles = Style.query.all()
-    suggestion = None
+    refs = reference_data.get()
+    suggestions = []
+    daily = None
 
-    if request.method == "POST":
-        season_id = request.form.get("season_id") or None
-        style_id = request.form.get("style_id") or None
-
-        # fetch available items by category
-        tops = get_available_items(session["user_id"], season_id=season_id, style_id=style_id)
-        tops = [i for i in tops if i.category == "top"]
-        bottoms = get_available_items(session["user_id"], season_id=season_id, style_id=style_id)
-        bottoms = [i for i in bottoms if i.category == "bottom"]
-        shoes = get_available_items(session["user_id"], season_id=season_id, style_id=style_id)
-        shoes = [i for i in shoes if i.category == "shoes"]
-
-        if not tops or not bottoms or not shoes:
-            # not enough items to form outfit
-            suggestion = None
+    if request.method == "GET":
+        daily = get_daily_outfit(session["user_id"])
+    else:
+        season_id = request.form.get("season_id", type=int)
+        style_id = request.form.get("style_id", type=int)
+        count = min(max(request.form.get("count", 1, type=int) or 1, 1), MAX_BATCH_OUTFITS)
+
+        if request.form.get("mode") == "best" and scoring.HAS_NUMPY:
+            outfits = best_outfits(session["user_id"], season_id=season_id, style_id=style_id, count=count)
         else:
-            top = random.choice(tops)
-            bottom = random.choice(bottoms)
-            shoe = random.choice(shoes)
-
-            # save suggestion
-            sug = OutfitSuggestion(
-                user_id=session["user_id"],
-                season_id=season_id,
-                style_id=style_id,
-                top_item_id=top.item_id,
-                bottom_item_id=bottom.item_id,
-                shoes_item_id=shoe.item_id
-            )
-            db.session.add(sug)
+            outfits = sample_outfits(session["user_id"], season_id=season_id, style_id=style_id, count=count)
+
+        if outfits:
+            sugs = []
+            for top, bottom, shoe in outfits:
+                sugs.append(OutfitSuggestion(
+                    user_id=session["user_id"],
+                    season_id=season_id,
+                    style_id=style_id,
+                    top_item_id=top.item_id,
+                    bottom_item_id=bottom.item_id,
+                    shoes_item_id=shoe.item_id
+                ))
+                suggestions.append({"top": top, "bottom": bottom, "shoes": shoe})
+
+            # save all suggestions, the latest pointer and rollups in a single transaction
+            record_suggestions(sugs, commit=False)
+            version = read_data_version(session["user_id"])
             db.session.commit()
-            suggestion = {"top": top, "bottom": bottom, "shoes": shoe}
+            sampler.saved(session["user_id"], version)
+            for suggestion, sug in zip(suggestions, sugs):
+                suggestion["suggestion_id"] = sug.suggestion_id
 
-    return render_template_string(BASE_TEMPLATE, title="Auto Outfit", content=render_template_string(AUTO_SELECT_HTML, seasons=seasons, styles=styles, suggestion=suggestion))
+    return render_template("auto.html", title="Auto Outfit", seasons=refs.seasons, styles=refs.styles, suggestions=suggestions, daily=daily, max_count=MAX_BATCH_OUTFITS, scoring_available=scoring.HAS_NUMPY)
+
+@bp.route("/outfits")
+def outfits():
+    if "user_id" not in session:
+        return redirect("/login")
+    favorites = bool(request.args.get("favorites", type=int))
+    page, next_before = page_saved_outfits(session["user_id"], favorites=favorites,
+                                           before_id=request.args.get("before", type=int),
+                                           limit=current_app.config['OUTFITS_PAGE_SIZE'])
+    return render_template("outfits.html", title="Outfits", outfits=page, favorites=favorites,
+                           next_before=next_before)
+
+@bp.route("/outfits/save", methods=["POST"])
+def save_outfits_route():
+    if "user_id" not in session:
+        return redirect("/login")
+    ids = request.form.getlist("suggestion_ids", type=int)
+    if ids:
+        save_outfits(session["user_id"], ids, favorite=bool(request.form.get("favorite")))
+    return redirect("/outfits")
+
+@bp.route("/outfits/<int:outfit_id>/favorite", methods=["POST"])
+def toggle_favorite(outfit_id):
+    if "user_id" not in session:
+        return redirect("/login")
+    outfit = db.session.get(Outfit, outfit_id)
+    if outfit and outfit.user_id == session["user_id"]:
+        outfit.is_favorite = not outfit.is_favorite
+        db.session.commit()
+    return redirect(request.referrer or "/outfits")
+
+@bp.route("/outfits/<int:outfit_id>/delete", methods=["POST"])
+def delete_outfit(outfit_id):
+    if "user_id" not in session:
+        return redirect("/login")
+    outfit = db.session.get(Outfit, outfit_id)
+    if outfit and outfit.user_id == session["user_id"]:
+        db.session.delete(outfit)
+        db.session.commit()
+    return redirect(request.referrer or "/outfits")
+
+# ------------------ JSON API ------------------
+# Compact JSON for the mobile client. Every response carries an ETag built from
+# the user's data_version, so a poll with If-None-Match gets a 304 after
+# reading one users row, without touching the item tables.
+
+def _api_item(item):
+    return {"id": item.item_id, "name": item.item_name, "category": item.category,
+            "image": media.thumbnail_url(item.image_url), "season_id": item.season_id, "style_id": item.style_id}
+
+def _api_response(resource, build, *key):
+    """JSON of build(user_id, items_version) for the logged-in user, or 304 if the client's copy is current.
+
+    The ETag covers the resource, the user's data_version, the query string and
+    key (values the body depends on besides the user's data). build() gets the
+    items_version read together with that data_version and must serve data at
+    least that new: read from the database after it, or from an availability
+    entry checked against it. A concurrent change can then only leave the tag
+    older than the body, and the next poll fetches it again.
+    """
+    user_id = session.get("user_id")
+    versions = None
+    if user_id is not None:
+        versions = read_versions(user_id)
+    if versions is None:
+        return {"error": "login required"}, 401
+    version, items_version = versions
+    etag = "%s-%d-%d-%08x" % (resource, user_id, version,
+                              zlib.crc32(request.query_string + repr(key).encode()))
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build(user_id, items_version))
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    response.vary.add("Cookie")
+    return response
+
+@bp.route("/api/wardrobe")
+def api_wardrobe():
+    def build(user_id, version):
+        page_size = current_app.config['WARDROBE_PAGE_SIZE']
+        limit = min(max(request.args.get("limit", page_size, type=int), 1), page_size)
+        items, next_after = page_available_items(user_id, after_id=request.args.get("after", type=int),
+                                                 limit=limit, version=version, **_grid_filters())
+        return {"items": [_api_item(item) for item in items], "next_after": next_after}
+    return _api_response("wardrobe", build)
+
+@bp.route("/api/laundry")
+def api_laundry():
+    def build(user_id, version):
+        rows = db.session.execute(
+            db.select(WardrobeItem.item_id, WardrobeItem.item_name, WardrobeItem.category,
+                      WardrobeItem.image_url, WardrobeItem.season_id, WardrobeItem.style_id, Laundry.added_at)
+            .join(WardrobeItem, Laundry.item_id == WardrobeItem.item_id)
+            .where(Laundry.user_id == user_id)
+            .order_by(Laundry.added_at, Laundry.id))
+        return {"items": [dict(_api_item(row), added_at=row.added_at.isoformat() if row.added_at else None)
+                          for row in rows]}
+    return _api_response("laundry", build)
+
+@bp.route("/api/suggestions")
+def api_suggestions():
+    # the outfit of the day changes with the date, not only with the data
+    day = datetime.now(timezone.utc).date()
+
+    def build(user_id, version):
+        rows = db.session.execute(
+            db.select(OutfitSuggestion.suggestion_id, OutfitSuggestion.created_at, OutfitSuggestion.season_id,
+                      OutfitSuggestion.style_id, OutfitSuggestion.top_item_id, OutfitSuggestion.bottom_item_id,
+                      OutfitSuggestion.shoes_item_id)
+            .where(OutfitSuggestion.user_id == user_id)
+            .order_by(OutfitSuggestion.created_at.desc(), OutfitSuggestion.suggestion_id.desc())
+            .limit(current_app.config['API_SUGGESTIONS_LIMIT']))
+        daily = get_daily_outfit(user_id, day, version)
+        return {
+            "daily": {slot: item.item_id for slot, item in daily.items()} if daily else None,
+            "suggestions": [{"id": row.suggestion_id,
+                             "created_at": row.created_at.isoformat() if row.created_at else None,
+                             "season_id": row.season_id, "style_id": row.style_id,
+                             "items": {"top": row.top_item_id, "bottom": row.bottom_item_id,
+                                       "shoes": row.shoes_item_id}}
+                            for row in rows],
+        }
+    return _api_response("suggestions", build, day)
 
 # ------------------ DB seeding for seasons/styles ------------------
 def seed_basic_data():
-    # seed seasons and styles if not present
+    # seed seasons and styles if not present; one idempotent statement per table
     base_seasons = ["summer", "winter", "monsoon", "all-season"]
     base_styles = ["casual", "formal", "party", "ethnic"]
 
-    for s in base_seasons:
-        if not Season.query.filter_by(season_name=s).first():
-            db.session.add(Season(season_name=s))
-    for st in base_styles:
-        if not Style.query.filter_by(style_name=st).first():
-            db.session.add(Style(style_name=st))
+    db.session.execute(insert_ignore(Season), [{"season_name": s} for s in base_seasons])
+    db.session.execute(insert_ignore(Style), [{"style_name": st} for st in base_styles])
     db.session.commit()
+    reference_data.invalidate()
+
+@bp.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the schema and seed seasons/styles."""
+    _backfill(migrate_schema())
+    seed_basic_data()
+    click.echo("Database ready.")
+
+@bp.cli.command("migrate")
+def migrate_command():
+    """Apply new tables, columns and indexes to an existing database."""
+    created = migrate_schema()
+    _backfill(created)
+    click.echo("Created: " + ", ".join(created) if created else "Schema is up to date.")
+
+def _backfill(created):
+    """Fill derived suggestion tables that migrate_schema() just created."""
+    if "latest_suggestions" in created:
+        rebuild_latest()
+    if "suggestion_item_rollups" in created or "suggestion_filter_rollups" in created:
+        rebuild_rollups()
+
+@bp.cli.command("precompute-daily")
+@click.option("--date", "day", type=click.DateTime(["%Y-%m-%d"]), default=None, help="Defaults to today (UTC).")
+@click.option("--workers", type=int, default=None, help="Defaults to PRECOMPUTE_WORKERS; 0 = no process pool.")
+@click.option("--seed", type=int, default=0)
+def precompute_daily_command(day, workers, seed):
+    """Precompute the outfit of the day for every user who has none yet."""
+    if workers is None:
+        workers = current_app.config['PRECOMPUTE_WORKERS']
+    result = precompute_daily(day=day.date() if day else None, workers=workers, seed=seed,
+                              partition_size=current_app.config['PRECOMPUTE_PARTITION_SIZE'])
+    click.echo("%s: %d outfits for %d users." % (result.day, result.written, result.users))
+
+@bp.cli.command("prune-suggestions")
+@click.option("--days", type=int, default=None, help="Defaults to SUGGESTION_RETENTION_DAYS.")
+def prune_suggestions_command(days):
+    """Delete outfit suggestions older than --days days (rollups are kept)."""
+    if days is None:
+        days = current_app.config['SUGGESTION_RETENTION_DAYS']
+    if days is None:
+        raise click.ClickException("SUGGESTION_RETENTION_DAYS is not set; pass --days")
+    pruned = prune_suggestions(datetime.now(timezone.utc) - timedelta(days=days),
+                               current_app.config['SUGGESTION_PRUNE_BATCH'])
+    click.echo("Pruned %d suggestions." % pruned)
+
+@bp.cli.command("restore-laundry")
+@click.option("--days", type=int, default=None, help="Defaults to LAUNDRY_AUTO_RESTORE_DAYS.")
+def restore_laundry_command(days):
+    """Restore every user's laundry entries older than --days days."""
+    if days is None:
+        days = current_app.config['LAUNDRY_AUTO_RESTORE_DAYS']
+    # restore_laundry() bumps the affected users' items_version, so running
+    # servers reload their availability entries on the next request
+    restored = restore_laundry(older_than=datetime.now(timezone.utc) - timedelta(days=days))
+    click.echo("Restored %d items." % restored)
+
+@bp.cli.command("import-items")
+@click.argument("email")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), help="Defaults to the file extension.")
+def import_items_command(email, path, fmt):
+    """Import wardrobe items for the user with EMAIL from a CSV/JSONL file."""
+    user = User.query.filter_by(email=email).first()
+    if user is None:
+        raise click.ClickException("No user with email %s" % email)
+    with open(path, "rb") as f:
+        result = import_items(user.user_id, decode_lines(f), fmt or detect_format(path))
+    for line_no, message in result.errors:
+        click.echo("line %d: %s" % (line_no, message), err=True)
+    click.echo("Imported %d items, %d rows rejected." % (result.imported, len(result.errors)))
+
+# ------------------ App factory ------------------
+def create_app(config=None):
+    """Create the Flask app; config is a dict or object overriding Config."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.from_prefixed_env("VDROBE")
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+    db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+
+    app.register_blueprint(bp)
+    # after the blueprint, which registers the template filters
+    app.jinja_loader = DictLoader(TEMPLATES)
+    for name in TEMPLATES:
+        app.jinja_env.get_template(name)
+
+    Metrics(app)
+    PasswordHasher(app)
+    MediaStore(app)
+    AvailabilityIndex(app)
+    OutfitSampler(app)
+    ReferenceCache(app)
+    if app.config['SUGGESTION_PRUNE_INTERVAL'] and app.config['SUGGESTION_RETENTION_DAYS'] is not None:
+        start_pruning(app, app.config['SUGGESTION_PRUNE_INTERVAL'])
+    return app
 
 if __name__ == "__main__":
+    app = create_app()
     with app.app_context():
         # if you want a fresh DB: delete vdrobe.db file first, then run
-        db.create_all()
+        migrate_schema()
         seed_basic_data()
+        reference_data.get()
     app.run(debug=True)
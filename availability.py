@@ -0,0 +1,216 @@
+"""In-memory index of the wardrobe items each user currently has available.
+
+Items are bucketed by (category, season_id, style_id) so that outfit sampling
+and wardrobe rendering can be served without querying WardrobeItem/Laundry.
+
+Each entry is tagged with the User.items_version it was loaded at, and readers
+pass the version they just read: an entry with another version is stale
+(another worker process or a CLI job changed the user's items or laundry) and
+is loaded again. Suggestions only bump User.data_version, so generating
+outfits in one worker does not make the others reload the wardrobe. The
+mutating routes of this process apply their change to the entry after they
+commit, with the version their commit produced, so their own writes do not
+cost a reload.
+"""
+import itertools
+import threading
+from collections import OrderedDict, namedtuple
+
+
+AvailableItem = namedtuple(
+    "AvailableItem",
+    "item_id item_name category image_url season_id style_id",
+)
+
+
+_revisions = itertools.count(1)
+
+
+class UserAvailability:
+    """Available items of one user, keyed by item_id and bucketed by attributes.
+
+    version is the User.items_version the items correspond to; revision is
+    unique to the current item set, for caches built from it.
+    """
+
+    def __init__(self, items=(), version=None):
+        self.items = {}
+        self.buckets = {}
+        self.version = version
+        for item in sorted(items, key=lambda i: i.item_id):
+            self.add(item)
+        self.revision = next(_revisions)
+
+    def __len__(self):
+        return len(self.items)
+
+    @staticmethod
+    def bucket_key(item):
+        return (item.category, item.season_id, item.style_id)
+
+    def add(self, item):
+        self.discard(item.item_id)
+        self.items[item.item_id] = item
+        self.buckets.setdefault(self.bucket_key(item), {})[item.item_id] = item
+        self.revision = next(_revisions)
+
+    def discard(self, item_id):
+        item = self.items.pop(item_id, None)
+        if item is None:
+            return False
+        key = self.bucket_key(item)
+        bucket = self.buckets[key]
+        del bucket[item_id]
+        if not bucket:
+            del self.buckets[key]
+        self.revision = next(_revisions)
+        return True
+
+    def select(self, category=None, season_id=None, style_id=None):
+        """Return matching items ordered by item_id; None means "any"."""
+        if category is None and season_id is None and style_id is None:
+            return sorted(self.items.values(), key=lambda i: i.item_id)
+        found = []
+        for (cat, season, style), bucket in self.buckets.items():
+            if category is not None and cat != category:
+                continue
+            if season_id is not None and season != season_id:
+                continue
+            if style_id is not None and style != style_id:
+                continue
+            found.extend(bucket.values())
+        found.sort(key=lambda i: i.item_id)
+        return found
+
+
+class AvailabilityIndex:
+    """LRU cache of UserAvailability entries bounded by a total item budget.
+
+    Users whose wardrobe alone exceeds the budget are served from a fresh load
+    on every call and never cached; oversized() tells callers that can make do
+    with part of the wardrobe to query it themselves instead.
+    """
+
+    def __init__(self, app=None, max_items=200000, max_users=10000):
+        self.max_items = max_items
+        self.max_users = max_users
+        self._users = OrderedDict()
+        self._size = 0
+        # users last seen with more than max_items items
+        self._oversized = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_items = app.config["AVAILABILITY_INDEX_MAX_ITEMS"]
+        self.clear()
+        app.extensions["availability"] = self
+
+    def __len__(self):
+        return len(self._users)
+
+    @property
+    def size(self):
+        return self._size
+
+    def get(self, user_id, loader, version):
+        """Return the user's entry for items_version version, calling loader(user_id) on a miss.
+
+        Read version before anything loader reads, so that an entry is never
+        tagged with a newer version than its items. Entries without a version
+        (the user row is gone) are not cached.
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                if entry.version == version:
+                    self._users.move_to_end(user_id)
+                    return entry
+                self._drop(user_id)
+
+        entry = UserAvailability(loader(user_id), version)
+        if version is None:
+            return entry
+        if len(entry) > self.max_items:
+            with self._lock:
+                self._oversized[user_id] = True
+                while len(self._oversized) > self.max_users:
+                    self._oversized.popitem(last=False)
+            return entry
+
+        with self._lock:
+            self._oversized.pop(user_id, None)
+            current = self._users.get(user_id)
+            if current is None or current.version < version:
+                if current is not None:
+                    self._drop(user_id)
+                self._users[user_id] = entry
+                self._size += len(entry)
+                self._evict()
+        return entry
+
+    def select(self, user_id, loader, version, category=None, season_id=None, style_id=None):
+        """Return the user's available items matching the filters.
+
+        Entries are updated in place by the write-through methods, so reads go
+        through the lock as well.
+        """
+        entry = self.get(user_id, loader, version)
+        with self._lock:
+            return entry.select(category, season_id, style_id)
+
+    def oversized(self, user_id):
+        """True if the user's last load did not fit in max_items."""
+        with self._lock:
+            return user_id in self._oversized
+
+    # write-through: version is the items_version the caller's commit produced
+
+    def add(self, user_id, item, version):
+        self._apply(user_id, version, lambda entry: entry.add(item))
+
+    def discard(self, user_id, item_ids, version):
+        def change(entry):
+            for item_id in item_ids:
+                entry.discard(item_id)
+        self._apply(user_id, version, change)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._drop(user_id)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._oversized.clear()
+            self._size = 0
+
+    def _apply(self, user_id, version, change):
+        if version is None:
+            self.invalidate(user_id)
+            return
+        with self._lock:
+            entry = self._users.get(user_id)
+            # not cached, or loaded after the commit and already up to date
+            if entry is None or entry.version >= version:
+                return
+            if entry.version != version - 1:
+                # other commits happened in between; reload on the next read
+                self._drop(user_id)
+                return
+            self._size -= len(entry)
+            change(entry)
+            entry.version = version
+            self._size += len(entry)
+            self._evict()
+
+    def _drop(self, user_id):
+        entry = self._users.pop(user_id, None)
+        if entry is not None:
+            self._size -= len(entry)
+
+    def _evict(self):
+        while self._users and (self._size > self.max_items or len(self._users) > self.max_users):
+            _, entry = self._users.popitem(last=False)
+            self._size -= len(entry)
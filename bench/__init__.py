@@ -0,0 +1,8 @@
+"""Reproducible benchmarks for the wardrobe app.
+
+Run ``python -m bench --help``. A throwaway SQLite database is seeded with a
+synthetic wardrobe (see bench.synthetic), every route is driven through the
+Flask test client and, optionally, through a local threaded HTTP server with
+concurrent clients; the report is printed as JSON so runs can be diffed
+across commits.
+"""
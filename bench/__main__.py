@@ -0,0 +1,77 @@
+"""Command line entry point: python -m bench [options]."""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--items", type=int, default=500, help="wardrobe items per user")
+    parser.add_argument("--laundry-fraction", type=float, default=0.1)
+    parser.add_argument("--suggestions", type=int, default=200, help="suggestion history per user")
+    parser.add_argument("--iterations", type=int, default=20, help="test-client passes per user")
+    parser.add_argument("--http", action="store_true", help="also run the concurrent HTTP load")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="HTTP requests per client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="vdrobe-bench-") as tmp:
+        from app import create_app, seed_basic_data
+        from models import db, migrate_schema
+        from bench.runner import run_http, run_test_client
+        from bench.synthetic import seed_synthetic
+
+        app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+                          "OUTFIT_SAMPLER_SEED": args.seed})
+        with app.app_context():
+            migrate_schema()
+            seed_basic_data()
+            t0 = time.perf_counter()
+            user_ids = seed_synthetic(users=args.users, items_per_user=args.items,
+                                      laundry_fraction=args.laundry_fraction,
+                                      suggestions_per_user=args.suggestions, seed=args.seed)
+            seed_seconds = time.perf_counter() - t0
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "args": vars(args),
+                "seed_seconds": round(seed_seconds, 3),
+            },
+            "test_client": run_test_client(app, user_ids, iterations=args.iterations),
+        }
+        if args.http:
+            report["http"] = run_http(app, user_ids, concurrency=args.concurrency,
+                                      requests_per_client=args.requests)
+
+        with app.app_context():
+            db.engine.dispose()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
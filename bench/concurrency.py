@@ -0,0 +1,147 @@
+"""Concurrent read/write benchmark for SQLite engine profiles.
+
+python -m bench.concurrency runs the same mixed workload against a fresh
+database per profile: reader threads run the availability query used by the
+item grids while writer threads toggle laundry entries and insert outfit
+suggestions. "default" uses SQLite's rollback journal, "tuned" applies
+Config.SQLITE_PRAGMAS (WAL etc.). The JSON report has operations per second,
+latency percentiles and lock errors per profile.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, delete, insert, select
+from sqlalchemy.exc import OperationalError
+
+from config import Config, install_sqlite_pragmas
+from models import db, User, WardrobeItem, Laundry, OutfitSuggestion, ITEM_CATEGORIES
+
+from bench.runner import summarize
+
+PROFILES = {
+    "default": {},
+    "tuned": Config.SQLITE_PRAGMAS,
+}
+
+
+def _seed(engine, users, items_per_user, rng):
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"user_id": u, "username": "u%d" % u, "email": "u%d@example.com" % u,
+                                     "password_hash": "x"} for u in range(1, users + 1)])
+        rows = []
+        for u in range(1, users + 1):
+            for n in range(items_per_user):
+                rows.append({"user_id": u, "item_name": "item", "category": rng.choice(ITEM_CATEGORIES),
+                             "image_url": "https://img.example.com/x.jpg"})
+        conn.execute(insert(WardrobeItem), rows)
+    with engine.connect() as conn:
+        owned = conn.execute(select(WardrobeItem.user_id, WardrobeItem.item_id)).all()
+    by_user = {}
+    for user_id, item_id in owned:
+        by_user.setdefault(user_id, []).append(item_id)
+    return by_user
+
+
+def run_profile(name, pragmas, users, items_per_user, readers, writers, seconds, seed):
+    with tempfile.TemporaryDirectory(prefix="vdrobe-concurrency-") as tmp:
+        engine = create_engine("sqlite:///" + os.path.join(tmp, "bench.db"),
+                               pool_size=readers + writers, max_overflow=0)
+        install_sqlite_pragmas(engine, pragmas)
+        db.metadata.create_all(engine)
+        items = _seed(engine, users, items_per_user, random.Random(seed))
+
+        latencies = {"read": [], "write": []}
+        errors = {"read": 0, "write": 0}
+        lock = threading.Lock()
+        stop = time.perf_counter() + seconds
+
+        def reader(n):
+            rng = random.Random(seed + n)
+            local, failed = [], 0
+            while time.perf_counter() < stop:
+                user_id = rng.randint(1, users)
+                in_laundry = select(Laundry.item_id).where(Laundry.user_id == user_id)
+                query = (select(WardrobeItem.item_id, WardrobeItem.category)
+                         .where(WardrobeItem.user_id == user_id, WardrobeItem.item_id.not_in(in_laundry)))
+                t0 = time.perf_counter()
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(query).all()
+                except OperationalError:
+                    failed += 1
+                    continue
+                local.append(time.perf_counter() - t0)
+            with lock:
+                latencies["read"].extend(local)
+                errors["read"] += failed
+
+        def writer(n):
+            rng = random.Random(seed + 1000 + n)
+            local, failed = [], 0
+            while time.perf_counter() < stop:
+                user_id = rng.randint(1, users)
+                item_id = rng.choice(items[user_id])
+                t0 = time.perf_counter()
+                try:
+                    with engine.begin() as conn:
+                        if rng.random() < 0.5:
+                            conn.execute(insert(OutfitSuggestion).values(
+                                user_id=user_id, top_item_id=item_id, bottom_item_id=item_id,
+                                shoes_item_id=item_id))
+                        else:
+                            removed = conn.execute(delete(Laundry).where(
+                                Laundry.user_id == user_id, Laundry.item_id == item_id)).rowcount
+                            if not removed:
+                                conn.execute(insert(Laundry).values(user_id=user_id, item_id=item_id))
+                except OperationalError:
+                    failed += 1
+                    continue
+                local.append(time.perf_counter() - t0)
+            with lock:
+                latencies["write"].extend(local)
+                errors["write"] += failed
+
+        threads = ([threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+                   + [threading.Thread(target=writer, args=(n,)) for n in range(writers)])
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    report = {kind: summarize(values, elapsed) for kind, values in latencies.items()}
+    for kind in report:
+        report[kind]["errors"] = errors[kind]
+    report["pragmas"] = dict(pragmas)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.concurrency", description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=500, help="wardrobe items per user")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per profile")
+    parser.add_argument("--profile", choices=sorted(PROFILES), action="append",
+                        help="profiles to run (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = {"args": vars(args)}
+    for name in args.profile or sorted(PROFILES):
+        report[name] = run_profile(name, PROFILES[name], args.users, args.items,
+                                   args.readers, args.writers, args.seconds, args.seed)
+    sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
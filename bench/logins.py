@@ -0,0 +1,124 @@
+"""Login storm benchmark.
+
+python -m bench.logins seeds a temporary database and serves the app over
+HTTP. It first measures --probes clients browsing /wardrobe and /laundry on
+their own (baseline), then again while --storm clients post /login in a loop.
+The JSON report has login throughput and latency, how many logins were turned
+away with 503, and probe latency percentiles for both phases, i.e. how much a
+login burst slows down everything else. --method, --workers and --queue
+override the PASSWORD_HASH_* settings; --stale-hashes seeds users with a
+different method so the storm also exercises rehash-on-login.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from bench.runner import LocalServer, http_client, new_opener, request, summarize
+from bench.synthetic import BENCH_PASSWORD, bench_email, seed_synthetic
+
+PROBE_PATHS = ("/wardrobe", "/laundry")
+
+
+def _phase(base_url, user_ids, probes, storm, seconds):
+    latencies = {"probe": [], "login": []}
+    statuses = {}
+    lock = threading.Lock()
+    clients = [http_client(base_url, bench_email(user_ids[n % len(user_ids)])) for n in range(probes)]
+    stop = time.perf_counter() + seconds
+
+    def probe(n):
+        opener, local = clients[n], []
+        i = 0
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            request(opener, base_url, "GET", PROBE_PATHS[i % len(PROBE_PATHS)])
+            local.append(time.perf_counter() - t0)
+            i += 1
+        with lock:
+            latencies["probe"].extend(local)
+
+    def login(n):
+        form = {"email": bench_email(user_ids[n % len(user_ids)]), "password": BENCH_PASSWORD}
+        local, codes = [], {}
+        while time.perf_counter() < stop:
+            t0 = time.perf_counter()
+            status = request(new_opener(), base_url, "POST", "/login", form)
+            local.append(time.perf_counter() - t0)
+            codes[status] = codes.get(status, 0) + 1
+        with lock:
+            latencies["login"].extend(local)
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = ([threading.Thread(target=probe, args=(n,)) for n in range(probes)]
+               + [threading.Thread(target=login, args=(n,)) for n in range(storm)])
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    report = {"probes": summarize(latencies["probe"], elapsed)}
+    if storm:
+        report["logins"] = summarize(latencies["login"], elapsed)
+        report["logins"]["succeeded"] = statuses.get(302, 0)
+        report["logins"]["busy"] = statuses.get(503, 0)
+        report["logins"]["other"] = sum(c for s, c in statuses.items() if s not in (302, 503))
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.logins", description=__doc__)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--items", type=int, default=200, help="wardrobe items per user")
+    parser.add_argument("--probes", type=int, default=4, help="clients browsing other routes")
+    parser.add_argument("--storm", type=int, default=32, help="clients posting /login")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration per phase")
+    parser.add_argument("--method", help="PASSWORD_HASH_METHOD")
+    parser.add_argument("--workers", type=int, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--queue", type=int, help="PASSWORD_HASH_QUEUE")
+    parser.add_argument("--stale-hashes", action="store_true",
+                        help="seed pbkdf2 hashes so logins rehash them")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="vdrobe-logins-") as tmp:
+        from app import create_app, seed_basic_data
+        from models import db, migrate_schema
+
+        config = {"SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+                  "OUTFIT_SAMPLER_SEED": args.seed}
+        for key, value in (("PASSWORD_HASH_METHOD", args.method), ("PASSWORD_HASH_WORKERS", args.workers),
+                           ("PASSWORD_HASH_QUEUE", args.queue)):
+            if value is not None:
+                config[key] = value
+        app = create_app(config)
+        hasher = app.extensions["password_hasher"]
+        with app.app_context():
+            migrate_schema()
+            seed_basic_data()
+            user_ids = seed_synthetic(users=args.users, items_per_user=args.items, suggestions_per_user=20,
+                                      seed=args.seed,
+                                      password_method="pbkdf2" if args.stale_hashes else hasher.method)
+
+        with LocalServer(app) as server:
+            report = {
+                "args": vars(args),
+                "hash": {"method": hasher.method, "workers": hasher.max_workers, "queue": hasher.max_pending},
+                "baseline": _phase(server.base_url, user_ids, args.probes, 0, args.seconds),
+                "storm": _phase(server.base_url, user_ids, args.probes, args.storm, args.seconds),
+            }
+        hasher.shutdown()
+        with app.app_context():
+            db.engine.dispose()
+
+    sys.stdout.write(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""Route drivers and latency statistics for the benchmark suite."""
+import http.cookiejar
+import math
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from models import db, Laundry, WardrobeItem
+
+from bench.synthetic import BENCH_PASSWORD, bench_email
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(pct / 100.0 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize(latencies, elapsed=None):
+    """Summary dict (milliseconds) for a list of latencies in seconds."""
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    summary = {
+        "requests": len(values),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(values) / elapsed, 2)
+    return summary
+
+
+def route_plan(app, user_id):
+    """Return [(name, method, path, form)] covering every benchmarked route for a user."""
+    with app.app_context():
+        laundry_ids = [i for (i,) in db.session.query(Laundry.item_id)
+                       .filter(Laundry.user_id == user_id).limit(50)]
+        in_laundry = db.session.query(Laundry.item_id).filter(Laundry.user_id == user_id)
+        free_id = (db.session.query(WardrobeItem.item_id)
+                   .filter(WardrobeItem.user_id == user_id, WardrobeItem.item_id.not_in(in_laundry))
+                   .order_by(WardrobeItem.item_id).limit(1).scalar())
+    plan = [
+        ("index", "GET", "/", None),
+        ("wardrobe", "GET", "/wardrobe", None),
+        ("laundry", "GET", "/laundry", None),
+        ("auto_get", "GET", "/auto", None),
+        ("auto_post", "POST", "/auto", {"season_id": "", "style_id": ""}),
+        ("add_get", "GET", "/add", None),
+        ("add_post", "POST", "/add", {"item_name": "bench item", "category": "top",
+                                      "image_url": "https://img.example.com/new.jpg",
+                                      "season_id": "1", "style_id": "1"}),
+    ]
+    if free_id is not None:
+        # moved and restored again so repeated runs see the same laundry state
+        plan.append(("move_to_laundry", "GET", "/laundry/%d" % free_id, None))
+        plan.append(("restore", "GET", "/restore/%d" % free_id, None))
+    elif laundry_ids:
+        plan.append(("restore", "GET", "/restore/%d" % laundry_ids[0], None))
+    return plan
+
+
+def run_test_client(app, user_ids, iterations=20):
+    """Drive every route `iterations` times per user through the Flask test client."""
+    latencies = {}
+    started = time.perf_counter()
+    for user_id in user_ids:
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["user_id"] = user_id
+        plan = route_plan(app, user_id)
+        for _ in range(iterations):
+            for name, method, path, form in plan:
+                t0 = time.perf_counter()
+                response = client.open(path, method=method, data=form)
+                response.get_data()
+                latencies.setdefault(name, []).append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    report = {name: summarize(values) for name, values in sorted(latencies.items())}
+    report["all"] = summarize([v for values in latencies.values() for v in values], elapsed)
+    return report
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class LocalServer:
+    """Threaded werkzeug server for the app on a free local port."""
+
+    def __init__(self, app):
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=_QuietHandler)
+        self.base_url = "http://127.0.0.1:%d" % self.server.server_port
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self._thread.join()
+
+
+def new_opener():
+    """Return an opener with its own cookie jar that does not follow redirects."""
+    return urllib.request.build_opener(
+        urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+
+def http_client(base_url, email, password=BENCH_PASSWORD):
+    """Return an opener logged in as the given user (cookies kept, redirects not followed)."""
+    opener = new_opener()
+    request(opener, base_url, "POST", "/login", {"email": email, "password": password})
+    return opener
+
+
+def request(opener, base_url, method, path, form=None):
+    data = urllib.parse.urlencode(form).encode() if form is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    try:
+        with opener.open(req) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        # redirects surface as HTTPError because they are not followed
+        e.read()
+        return e.code
+
+
+def run_http(app, user_ids, concurrency=8, requests_per_client=100):
+    """Concurrent clients, one user each, cycling through the route plan over HTTP."""
+    plans = {user_id: route_plan(app, user_id) for user_id in user_ids}
+    latencies = {}
+    errors = []
+    lock = threading.Lock()
+
+    with LocalServer(app) as server:
+        def worker(n):
+            user_id = user_ids[n % len(user_ids)]
+            opener = http_client(server.base_url, bench_email(user_id))
+            plan = plans[user_id]
+            local = {}
+            for i in range(requests_per_client):
+                name, method, path, form = plan[i % len(plan)]
+                t0 = time.perf_counter()
+                status = request(opener, server.base_url, method, path, form)
+                local.setdefault(name, []).append(time.perf_counter() - t0)
+                if status >= 400:
+                    with lock:
+                        errors.append((name, status))
+            with lock:
+                for name, values in local.items():
+                    latencies.setdefault(name, []).extend(values)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    report = {name: summarize(values) for name, values in sorted(latencies.items())}
+    report["all"] = summarize([v for values in latencies.values() for v in values], elapsed)
+    report["all"]["concurrency"] = concurrency
+    report["all"]["errors"] = len(errors)
+    return report
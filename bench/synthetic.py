@@ -0,0 +1,86 @@
+"""Synthetic wardrobe generator for benchmarks."""
+import random
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.security import generate_password_hash
+
+from models import db, User, WardrobeItem, Laundry, OutfitSuggestion, Season, Style, ITEM_CATEGORIES
+from suggestions import rebuild_latest, rebuild_rollups
+
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_email(n):
+    return "bench%d@example.com" % n
+
+
+def seed_synthetic(users=10, items_per_user=500, laundry_fraction=0.1, suggestions_per_user=200,
+                   seed=0, batch_size=5000, password_method="scrypt"):
+    """Fill the current database with synthetic users, items, laundry and history.
+
+    Must run inside an app context with seasons and styles already seeded.
+    Everything is derived from `seed`, so the same arguments give the same data.
+    Returns the list of created user ids.
+    """
+    rng = random.Random(seed)
+    season_ids = [s for (s,) in db.session.query(Season.season_id)]
+    style_ids = [s for (s,) in db.session.query(Style.style_id)]
+    # one hash for every user: hashing is deliberately slow
+    password_hash = generate_password_hash(BENCH_PASSWORD, password_method)
+    now = datetime.now(timezone.utc)
+
+    first_user = (db.session.query(db.func.max(User.user_id)).scalar() or 0) + 1
+    db.session.execute(db.insert(User), [
+        {"user_id": first_user + n, "username": "bench%d" % (first_user + n),
+         "email": bench_email(first_user + n), "password_hash": password_hash}
+        for n in range(users)
+    ])
+    user_ids = list(range(first_user, first_user + users))
+
+    first_item = (db.session.query(db.func.max(WardrobeItem.item_id)).scalar() or 0) + 1
+    item_id = first_item
+    items_by_user = {}
+    rows = []
+    for user_id in user_ids:
+        items_by_user[user_id] = {c: [] for c in ITEM_CATEGORIES}
+        for _ in range(items_per_user):
+            category = rng.choice(ITEM_CATEGORIES)
+            rows.append({
+                "item_id": item_id, "user_id": user_id, "category": category,
+                "item_name": "%s %d" % (category, item_id),
+                "image_url": "https://img.example.com/%d.jpg" % item_id,
+                "season_id": rng.choice(season_ids + [None]),
+                "style_id": rng.choice(style_ids + [None]),
+            })
+            items_by_user[user_id][category].append(item_id)
+            item_id += 1
+            if len(rows) >= batch_size:
+                db.session.execute(db.insert(WardrobeItem), rows)
+                rows = []
+    if rows:
+        db.session.execute(db.insert(WardrobeItem), rows)
+
+    laundry, suggestions = [], []
+    for user_id in user_ids:
+        by_category = items_by_user[user_id]
+        all_items = [i for ids in by_category.values() for i in ids]
+        for i in rng.sample(all_items, int(len(all_items) * laundry_fraction)):
+            laundry.append({"user_id": user_id, "item_id": i,
+                            "added_at": now - timedelta(hours=rng.randint(0, 24 * 7))})
+        if all(by_category.values()):
+            for n in range(suggestions_per_user):
+                suggestions.append({
+                    "user_id": user_id,
+                    "top_item_id": rng.choice(by_category["top"]),
+                    "bottom_item_id": rng.choice(by_category["bottom"]),
+                    "shoes_item_id": rng.choice(by_category["shoes"]),
+                    "created_at": now - timedelta(minutes=suggestions_per_user - n),
+                })
+    for table, data in ((Laundry, laundry), (OutfitSuggestion, suggestions)):
+        for start in range(0, len(data), batch_size):
+            db.session.execute(db.insert(table), data[start:start + batch_size])
+    db.session.commit()
+    # history went in through bulk inserts, not record_suggestions()
+    rebuild_latest()
+    rebuild_rollups()
+    return user_ids
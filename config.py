@@ -0,0 +1,117 @@
+"""Application configuration and database engine tuning.
+
+Settings live on Config; any of them can be overridden with a VDROBE_-prefixed
+environment variable (e.g. VDROBE_DB_POOL_SIZE=20), and the database URL with
+VDROBE_DATABASE_URI. engine_options() turns the DB_* settings into
+SQLALCHEMY_ENGINE_OPTIONS for server databases, and install_sqlite_pragmas()
+applies SQLITE_PRAGMAS to every new SQLite connection.
+"""
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+class Config:
+    SECRET_KEY = "virtual_wardrobe_secret"
+    SQLALCHEMY_DATABASE_URI = os.environ.get("VDROBE_DATABASE_URI", "sqlite:///vdrobe.db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SQLite: WAL lets readers run alongside a writer, synchronous=NORMAL is
+    # durable in WAL mode without an fsync per commit, cache_size is in KiB
+    # when negative, and busy_timeout makes writers wait instead of failing
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    }
+
+    # server databases (MySQL, PostgreSQL): connection pool sizing
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800   # seconds; below MySQL's default wait_timeout
+    DB_POOL_PRE_PING = True
+
+    # total number of items the in-memory availability index may hold across users
+    AVAILABILITY_INDEX_MAX_ITEMS = 200000
+    # recent suggestions per user that /auto avoids repeating and weights against
+    OUTFIT_HISTORY_WINDOW = 20
+    # fixed seed for reproducible outfit sampling (None = random)
+    OUTFIT_SAMPLER_SEED = None
+    # requests slower than this are logged with their SQL statements (None = off)
+    SLOW_REQUEST_MS = None
+
+    # wardrobe grids at least this large are streamed to the client in chunks;
+    # keep it at or below WARDROBE_PAGE_SIZE so full pages of / and /wardrobe stream
+    TEMPLATE_STREAM_MIN_ITEMS = 100
+    # items per page on / and /wardrobe, and rows per fetch when streaming
+    WARDROBE_PAGE_SIZE = 200
+    WARDROBE_STREAM_CHUNK = 500
+    # laundry entries older than this are restored by "Restore Older Than" and restore-laundry
+    LAUNDRY_AUTO_RESTORE_DAYS = 3
+    # best matches shown by /search
+    SEARCH_RESULTS_LIMIT = 100
+    # saved outfits per page on /outfits
+    OUTFITS_PAGE_SIZE = 50
+    # most recent suggestions returned by /api/suggestions
+    API_SUGGESTIONS_LIMIT = 20
+
+    # raw suggestion history older than this is deleted by prune-suggestions
+    # (daily rollups are kept); None = keep forever
+    SUGGESTION_RETENTION_DAYS = 90
+    SUGGESTION_PRUNE_BATCH = 5000
+    # prune in a background thread every this many seconds (None = only via the CLI)
+    SUGGESTION_PRUNE_INTERVAL = None
+
+    # precompute-daily: worker processes (None = one per CPU) and users per worker task
+    PRECOMPUTE_WORKERS = None
+    PRECOMPUTE_PARTITION_SIZE = 500
+
+    # uploaded images; MEDIA_ROOT None = <instance folder>/media
+    MEDIA_ROOT = None
+    MEDIA_MAX_BYTES = 10 * 1024 * 1024
+    # /media files never change under their name, so browsers may keep them for a year
+    MEDIA_MAX_AGE = 365 * 24 * 3600
+    # grid thumbnails: bounding box in pixels and worker processes making them
+    THUMBNAIL_SIZE = (320, 320)
+    THUMBNAIL_WORKERS = 2
+
+    # werkzeug hash method and work factor; older hashes are upgraded on login
+    PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+    # hashes run at once per process, and in flight before login returns 503
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_QUEUE = 32
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == "sqlite"
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database."""
+    options = dict(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {})
+    if is_sqlite(config["SQLALCHEMY_DATABASE_URI"]):
+        return options
+    options.setdefault("pool_size", config["DB_POOL_SIZE"])
+    options.setdefault("max_overflow", config["DB_MAX_OVERFLOW"])
+    options.setdefault("pool_timeout", config["DB_POOL_TIMEOUT"])
+    options.setdefault("pool_recycle", config["DB_POOL_RECYCLE"])
+    options.setdefault("pool_pre_ping", config["DB_POOL_PRE_PING"])
+    return options
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    """Run `PRAGMA name = value` for each pragma on every new SQLite connection."""
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA %s = %s" % (name, value))
+        cursor.close()
@@ -0,0 +1,181 @@
+"""Bulk import of wardrobe items from CSV or JSONL exports.
+
+Rows are parsed as a stream, validated one by one and inserted in batched
+executemany statements, each batch in its own transaction. Invalid rows are
+skipped and reported with their line number. A file that cannot be read on
+(not UTF-8, or broken CSV quoting) ends the import with an error at the first
+line not imported; the rows before it are kept.
+"""
+import codecs
+import csv
+import json
+
+from models import db, WardrobeItem, ITEM_CATEGORIES, bump_data_version
+from refdata import reference_data
+
+IMPORT_FORMATS = ("csv", "jsonl")
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.errors = []   # (line number, message)
+
+    def add_error(self, line_no, message):
+        self.errors.append((line_no, message))
+
+
+def detect_format(filename, default="csv"):
+    """Guess the import format from a file name."""
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def decode_lines(stream, encoding="utf-8-sig"):
+    """Yield the lines of a binary stream as text, line endings included.
+
+    Lines are decoded one at a time, so a UnicodeDecodeError is raised at the
+    first bad line rather than at the start of the buffer holding it.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for line in stream:
+        yield decoder.decode(line)
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+class _CountedLines:
+    """Iterator over the lines of a text stream counting the lines it has returned."""
+
+    def __init__(self, stream):
+        self._lines = iter(stream)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        self.count += 1
+        return line
+
+
+def iter_rows(stream, fmt):
+    """Yield (line number, row dict or error message) from a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, "invalid JSON: %s" % e
+                continue
+            yield line_no, row if isinstance(row, dict) else "expected a JSON object"
+    else:
+        raise ValueError("unsupported import format: %s" % fmt)
+
+
+def _lookup_id(row, name_key, id_key, by_name):
+    """Resolve a season/style given either by name or by id; None if absent."""
+    name = row.get(name_key)
+    if name not in (None, ""):
+        key = str(name).strip().lower()
+        if key not in by_name:
+            raise ValueError("unknown %s '%s'" % (name_key, name))
+        return by_name[key]
+    ref_id = row.get(id_key)
+    if ref_id in (None, ""):
+        return None
+    try:
+        ref_id = int(ref_id)
+    except (TypeError, ValueError):
+        raise ValueError("%s must be an integer" % id_key)
+    if ref_id not in by_name.values():
+        raise ValueError("unknown %s %s" % (id_key, ref_id))
+    return ref_id
+
+
+def validate_row(row, seasons, styles):
+    """Return WardrobeItem column values for a row, or raise ValueError.
+
+    seasons and styles map lower-cased names to ids.
+    """
+    item_name = str(row.get("item_name") or "").strip()
+    category = str(row.get("category") or "").strip().lower()
+    image_url = str(row.get("image_url") or "").strip()
+
+    if not item_name:
+        raise ValueError("item_name is required")
+    if len(item_name) > 100:
+        raise ValueError("item_name is longer than 100 characters")
+    if category not in ITEM_CATEGORIES:
+        raise ValueError("category must be one of %s" % ", ".join(ITEM_CATEGORIES))
+    if not image_url:
+        raise ValueError("image_url is required")
+    if len(image_url) > 300:
+        raise ValueError("image_url is longer than 300 characters")
+
+    return {
+        "item_name": item_name,
+        "category": category,
+        "image_url": image_url,
+        "season_id": _lookup_id(row, "season", "season_id", seasons),
+        "style_id": _lookup_id(row, "style", "style_id", styles),
+    }
+
+
+def import_items(user_id, stream, fmt="csv", batch_size=5000, result=None):
+    """Import wardrobe items for a user from a CSV/JSONL text stream (see decode_lines).
+
+    Returns an ImportResult; pass one in to see how many rows were imported
+    even if a database error interrupts the import.
+    """
+    refs = reference_data.get()
+
+    if result is None:
+        result = ImportResult()
+    batch = []
+    # a row's line number is only known once it is parsed, so read errors
+    # are placed by the lines read so far
+    lines = _CountedLines(stream)
+    try:
+        for line_no, row in iter_rows(lines, fmt):
+            if isinstance(row, str):
+                result.add_error(line_no, row)
+                continue
+            try:
+                values = validate_row(row, refs.season_ids, refs.style_ids)
+            except ValueError as e:
+                result.add_error(line_no, str(e))
+                continue
+            values["user_id"] = user_id
+            batch.append(values)
+            if len(batch) >= batch_size:
+                result.imported += _insert_batch(batch)
+                batch = []
+    except UnicodeDecodeError:
+        # raised while decoding the next line, before it is counted
+        result.add_error(lines.count + 1,
+                         "the file is not UTF-8 text; this and the following lines were not imported")
+    except csv.Error as e:
+        result.add_error(lines.count, "unreadable CSV (%s); this and the following lines were not imported" % e)
+    if batch:
+        result.imported += _insert_batch(batch)
+    return result
+
+
+def _insert_batch(rows):
+    db.session.execute(db.insert(WardrobeItem), rows)
+    bump_data_version([rows[0]["user_id"]], items=True)
+    db.session.commit()
+    return len(rows)
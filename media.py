@@ -0,0 +1,201 @@
+"""Content-addressed storage for uploaded item images, with thumbnails.
+
+An upload is stored once per distinct content under MEDIA_ROOT as
+originals/<first two hex digits>/<sha256>.<ext> and referenced from
+WardrobeItem.image_url as /media/<sha256>.<ext>, so the same photo uploaded
+twice takes disk space once. A file's name is its hash and never changes,
+which lets the /media routes be cached by browsers for MEDIA_MAX_AGE.
+
+Thumbnails (JPEG fitting THUMBNAIL_SIZE) are made by a small process pool so
+decoding and resizing stay off the request threads; the pool is started on
+first use. Until a thumbnail exists the grids get the original instead. Their
+URLs, /media/thumb/<width>x<height>/<name>, include the size, so changing
+THUMBNAIL_SIZE does not leave browsers on cached thumbnails of the old size.
+Pillow is optional: without it HAS_PILLOW is False and no thumbnails are made.
+"""
+import hashlib
+import importlib.util
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+HAS_PILLOW = importlib.util.find_spec("PIL") is not None
+
+MEDIA_PREFIX = "/media/"
+THUMBNAIL_PREFIX = "/media/thumb/"
+
+_MAGIC = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+_NAME = re.compile(r"^([0-9a-f]{64})\.(jpg|png|gif|webp)$")
+
+
+class MediaError(ValueError):
+    """The upload is not an accepted image."""
+
+
+def sniff_extension(head):
+    """File extension for the image type in the first bytes of a file, or None."""
+    for magic, ext in _MAGIC:
+        if head.startswith(magic):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def make_thumbnail(src, dst, size):
+    """Write a JPEG of src scaled to fit size to dst. Runs in a worker process."""
+    from PIL import Image, ImageOps
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = "%s.%d.tmp" % (dst, os.getpid())
+    with Image.open(src) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(size)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(tmp, "JPEG", quality=85, optimize=True)
+    os.replace(tmp, dst)
+    return dst
+
+
+class MediaStore:
+    def __init__(self, app=None, root="media", max_bytes=10 * 1024 * 1024,
+                 thumbnail_size=(320, 320), workers=2):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.thumbnail_size = tuple(thumbnail_size)
+        self.workers = workers
+        self._executor = None
+        self._pending = {}
+        # images Pillow could not read; not retried until restart
+        self._failed = set()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.root = app.config["MEDIA_ROOT"] or os.path.join(app.instance_path, "media")
+        self.max_bytes = app.config["MEDIA_MAX_BYTES"]
+        self.thumbnail_size = tuple(app.config["THUMBNAIL_SIZE"])
+        self.workers = app.config["THUMBNAIL_WORKERS"]
+        self.shutdown()
+        app.extensions["media"] = self
+
+    @property
+    def thumbnail_size_name(self):
+        """The thumbnail size as it appears in thumbnail URLs and paths, e.g. "320x320"."""
+        return "%dx%d" % self.thumbnail_size
+
+    # ---- paths ----
+
+    def thumbnail_url(self, image_url):
+        """URL of the thumbnail for a stored image; other URLs are returned unchanged."""
+        if image_url and image_url.startswith(MEDIA_PREFIX) and not image_url.startswith(THUMBNAIL_PREFIX):
+            return "%s%s/%s" % (THUMBNAIL_PREFIX, self.thumbnail_size_name, image_url[len(MEDIA_PREFIX):])
+        return image_url
+
+    def original_path(self, name):
+        """Path of a stored original; raises MediaError for malformed names."""
+        if _NAME.match(name) is None:
+            raise MediaError("not a media file name: %r" % name)
+        return os.path.join(self.root, "originals", name[:2], name)
+
+    def thumbnail_path(self, name):
+        match = _NAME.match(name)
+        if match is None:
+            raise MediaError("not a media file name: %r" % name)
+        return os.path.join(self.root, "thumbs", self.thumbnail_size_name, name[:2], match.group(1) + ".jpg")
+
+    # ---- writes ----
+
+    def save(self, stream):
+        """Store the image read from stream and return its name (<sha256>.<ext>).
+
+        Raises MediaError if it is larger than max_bytes or not a JPEG, PNG,
+        GIF or WebP image. Storing content that is already there is a no-op.
+        """
+        tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            digest, size, head = hashlib.sha256(), 0, b""
+            with os.fdopen(fd, "wb") as out:
+                for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise MediaError("image is larger than %d MB" % (self.max_bytes // (1024 * 1024)))
+                    if len(head) < 16:
+                        head += chunk[:16 - len(head)]
+                    digest.update(chunk)
+                    out.write(chunk)
+            ext = sniff_extension(head)
+            if ext is None:
+                raise MediaError("unsupported image type (use JPEG, PNG, GIF or WebP)")
+            name = "%s.%s" % (digest.hexdigest(), ext)
+            path = self.original_path(name)
+            if os.path.exists(path):
+                os.unlink(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.request_thumbnail(name)
+        return name
+
+    # ---- thumbnails ----
+
+    def thumbnail(self, name):
+        """Path of the thumbnail if it exists; otherwise schedule it and return None."""
+        path = self.thumbnail_path(name)
+        if os.path.exists(path):
+            return path
+        if os.path.exists(self.original_path(name)):
+            self.request_thumbnail(name)
+        return None
+
+    def request_thumbnail(self, name):
+        """Queue the thumbnail for a stored image unless it exists or is queued."""
+        if not HAS_PILLOW or self.workers <= 0:
+            return
+        dst = self.thumbnail_path(name)
+        with self._lock:
+            if name in self._pending or name in self._failed or os.path.exists(dst):
+                return
+            if self._executor is None:
+                # spawn: forking a threaded server process can deadlock the child
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            future = self._executor.submit(make_thumbnail, self.original_path(name), dst, self.thumbnail_size)
+            self._pending[name] = future
+        future.add_done_callback(lambda f: self._done(name, f))
+
+    def _done(self, name, future):
+        with self._lock:
+            self._pending.pop(name, None)
+            if not future.cancelled() and future.exception() is not None:
+                self._failed.add(name)
+
+    def wait(self):
+        """Block until every queued thumbnail is written (for scripts and tests)."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.exception()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._pending.clear()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,183 @@
+"""Per-endpoint request, SQL and template timing exposed in Prometheus format.
+
+Metrics.init_app() hooks the Flask request cycle, SQLAlchemy cursor events and
+Jinja render signals, and registers a /metrics endpoint. Per-request numbers
+are kept on flask.g and folded into shared counters once per request, so the
+hot path only does a few additions. A request is folded in when the server
+closes its response, so streamed pages count the rendering and SQL that run
+while their body is generated.
+"""
+import bisect
+import functools
+import threading
+import time
+
+from flask import Response, g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# latency histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# statements kept per request for the slow-request log
+MAX_CAPTURED_STATEMENTS = 100
+
+
+class _RequestStats:
+    __slots__ = ("start", "sql_count", "sql_seconds", "template_seconds", "statements",
+                 "capture", "_query_start", "_render_start")
+
+    def __init__(self, capture):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = []
+        self.capture = capture
+        self._query_start = None
+        self._render_start = None
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get("_metrics")
+    return None
+
+
+# engine events are global, so they are registered once for all apps and
+# write to whichever request is active
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is not None:
+        stats._query_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    if stats is None or stats._query_start is None:
+        return
+    elapsed = time.perf_counter() - stats._query_start
+    stats._query_start = None
+    stats.sql_count += 1
+    stats.sql_seconds += elapsed
+    if stats.capture and len(stats.statements) < MAX_CAPTURED_STATEMENTS:
+        stats.statements.append((elapsed, statement))
+
+
+class _EndpointStats:
+    def __init__(self, nbuckets):
+        self.bucket_counts = [0] * (nbuckets + 1)   # last slot is +Inf
+        self.count = 0
+        self.seconds = 0.0
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Metrics:
+    def __init__(self, app=None, buckets=DEFAULT_BUCKETS, prefix="vdrobe"):
+        self.buckets = tuple(buckets)
+        self.prefix = prefix
+        self.slow_request_seconds = None
+        self._endpoints = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        slow_ms = app.config.get("SLOW_REQUEST_MS")
+        self.slow_request_seconds = slow_ms / 1000.0 if slow_ms else None
+        self._logger = app.logger
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+        app.add_url_rule("/metrics", "metrics", self.export)
+        app.extensions["metrics"] = self
+
+    # ---- collection ----
+
+    def _before_request(self):
+        g._metrics = _RequestStats(capture=self.slow_request_seconds is not None)
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None:
+            stats._render_start = time.perf_counter()
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = _current_stats()
+        if stats is not None and stats._render_start is not None:
+            stats.template_seconds += time.perf_counter() - stats._render_start
+            stats._render_start = None
+
+    def _after_request(self, response):
+        stats = g.get("_metrics")
+        if stats is None:
+            return response
+        # stats stays on g until the request context goes away, so statements
+        # and templates run by a streamed body are still counted
+        response.call_on_close(functools.partial(
+            self._finish, request.endpoint or "none", request.method, request.path, stats))
+        return response
+
+    def _finish(self, endpoint, method, path, stats):
+        elapsed = time.perf_counter() - stats.start
+        with self._lock:
+            ep = self._endpoints.get(endpoint)
+            if ep is None:
+                ep = self._endpoints[endpoint] = _EndpointStats(len(self.buckets))
+            ep.bucket_counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+            ep.count += 1
+            ep.seconds += elapsed
+            ep.sql_count += stats.sql_count
+            ep.sql_seconds += stats.sql_seconds
+            ep.template_seconds += stats.template_seconds
+        if self.slow_request_seconds is not None and elapsed >= self.slow_request_seconds:
+            self._log_slow(endpoint, method, path, elapsed, stats)
+
+    def _log_slow(self, endpoint, method, path, elapsed, stats):
+        lines = ["slow request %s %s (%s): %.1f ms, %d SQL statements in %.1f ms, templates %.1f ms"
+                 % (method, path, endpoint, elapsed * 1000, stats.sql_count,
+                    stats.sql_seconds * 1000, stats.template_seconds * 1000)]
+        for seconds, statement in stats.statements:
+            lines.append("  %.1f ms  %s" % (seconds * 1000, " ".join(statement.split())))
+        self._logger.warning("\n".join(lines))
+
+    # ---- export ----
+
+    def render(self):
+        """Return all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = [(name, ep.bucket_counts[:], ep.count, ep.seconds, ep.sql_count,
+                         ep.sql_seconds, ep.template_seconds)
+                        for name, ep in sorted(self._endpoints.items())]
+        p = self.prefix
+        out = [
+            "# HELP %s_request_duration_seconds Request latency by endpoint." % p,
+            "# TYPE %s_request_duration_seconds histogram" % p,
+        ]
+        for name, bucket_counts, count, seconds, _, _, _ in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), bucket_counts):
+                cumulative += n
+                out.append('%s_request_duration_seconds_bucket{endpoint="%s",le="%s"} %d'
+                           % (p, name, bound, cumulative))
+            out.append('%s_request_duration_seconds_sum{endpoint="%s"} %.6f' % (p, name, seconds))
+            out.append('%s_request_duration_seconds_count{endpoint="%s"} %d' % (p, name, count))
+
+        for metric, help_text, column, fmt in (
+                ("sql_statements_total", "SQL statements executed by endpoint.", 4, "%d"),
+                ("sql_seconds_total", "Time spent in SQL statements by endpoint.", 5, "%.6f"),
+                ("template_seconds_total", "Time spent rendering templates by endpoint.", 6, "%.6f")):
+            out.append("# HELP %s_%s %s" % (p, metric, help_text))
+            out.append("# TYPE %s_%s counter" % (p, metric))
+            for row in snapshot:
+                out.append(('%s_%s{endpoint="%s"} ' + fmt) % (p, metric, row[0], row[column]))
+        return "\n".join(out) + "\n"
+
+    def export(self):
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
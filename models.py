@@ -1,9 +1,14 @@
 from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.schema import CreateColumn
 from flask_login import UserMixin
 
 db = SQLAlchemy()
 
+ITEM_CATEGORIES = ("top", "bottom", "shoes")
+
+
 class User(db.Model, UserMixin):
     __tablename__ = "users"
 
@@ -11,6 +16,12 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(200), nullable=False)
+    # bumped with every change to the user's items, laundry or suggestions;
+    # the /api responses derive their ETags from it
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # bumped only with changes to the user's items or laundry; the in-memory
+    # availability index checks its entries against it
+    items_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     wardrobe_items = db.relationship(
         "WardrobeItem",
@@ -49,6 +60,11 @@ class Style(db.Model):
 
 class WardrobeItem(db.Model):
     __tablename__ = "wardrobe_items"
+    __table_args__ = (
+        # availability/outfit lookups: user, then category and season/style filters
+        db.Index("ix_wardrobe_items_user_category", "user_id", "category", "season_id", "style_id"),
+        db.Index("ix_wardrobe_items_user_season_style", "user_id", "season_id", "style_id"),
+    )
 
     item_id = db.Column(db.Integer, primary_key=True)
     item_name = db.Column(db.String(100), nullable=False)
@@ -73,11 +89,16 @@ class WardrobeItem(db.Model):
 
 class Outfit(db.Model):
     __tablename__ = "outfits"
+    __table_args__ = (
+        # saved-outfit history and favorites, newest first, paged by outfit_id
+        db.Index("ix_outfits_user_outfit", "user_id", "outfit_id"),
+        db.Index("ix_outfits_user_favorite", "user_id", "is_favorite", "outfit_id"),
+    )
 
     outfit_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     outfit_name = db.Column(db.String(100))
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_favorite = db.Column(db.Boolean, default=False)
 
     user = db.relationship("User", back_populates="outfits")
@@ -91,6 +112,11 @@ class Outfit(db.Model):
 
 class OutfitItem(db.Model):
     __tablename__ = "outfit_items"
+    __table_args__ = (
+        db.Index("ix_outfit_items_outfit", "outfit_id"),
+        # deleting a wardrobe item finds the outfit entries that use it
+        db.Index("ix_outfit_items_item", "item_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     outfit_id = db.Column(db.Integer, db.ForeignKey("outfits.outfit_id"), nullable=False)
@@ -102,11 +128,16 @@ class OutfitItem(db.Model):
 
 class Laundry(db.Model):
     __tablename__ = "laundry"
+    __table_args__ = (
+        # one laundry entry per item; also serves the per-user NOT IN subquery
+        db.Index("uq_laundry_user_item", "user_id", "item_id", unique=True),
+        db.Index("ix_laundry_item", "item_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.item_id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
-    added_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    added_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     # quick access relationships
     item = db.relationship("WardrobeItem")
@@ -115,6 +146,11 @@ class Laundry(db.Model):
 
 class OutfitSuggestion(db.Model):
     __tablename__ = "outfit_suggestions"
+    __table_args__ = (
+        db.Index("ix_outfit_suggestions_user_created", "user_id", "created_at"),
+        # retention pruning scans by age across all users
+        db.Index("ix_outfit_suggestions_created", "created_at"),
+    )
 
     suggestion_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -123,10 +159,222 @@ class OutfitSuggestion(db.Model):
     top_item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.item_id"), nullable=True)
     bottom_item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.item_id"), nullable=True)
     shoes_item_id = db.Column(db.Integer, db.ForeignKey("wardrobe_items.item_id"), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     user = db.relationship("User", back_populates="outfit_suggestions")
     season = db.relationship("Season")
     style = db.relationship("Style")
 
 
+class LatestSuggestion(db.Model):
+    """Pointer to each user's most recent suggestion, kept by suggestions.record_suggestions()."""
+    __tablename__ = "latest_suggestions"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    suggestion_id = db.Column(db.Integer, db.ForeignKey("outfit_suggestions.suggestion_id"), nullable=False)
+
+
+class DailyOutfit(db.Model):
+    """Each user's precomputed outfit of the day, written by precompute.precompute_daily()."""
+    __tablename__ = "daily_outfits"
+
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    suggestion_id = db.Column(db.Integer, db.ForeignKey("outfit_suggestions.suggestion_id"), nullable=False)
+
+
+class SuggestionItemRollup(db.Model):
+    """How often an item was suggested to its owner per day (UTC)."""
+    __tablename__ = "suggestion_item_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SuggestionFilterRollup(db.Model):
+    """Suggestions per user, season and style filter per day (UTC); 0 = no filter."""
+    __tablename__ = "suggestion_filter_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, primary_key=True)
+    season_id = db.Column(db.Integer, primary_key=True)
+    style_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# SQLite only: FTS5 index over item names for search.py. It uses wardrobe_items
+# as external content and is kept in sync by triggers, so Core bulk inserts
+# (imports) are indexed as well as ORM writes.
+FTS_TABLE = "wardrobe_items_fts"
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS wardrobe_items_fts USING fts5("
+    "item_name, content='wardrobe_items', content_rowid='item_id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_insert AFTER INSERT ON wardrobe_items BEGIN "
+    "INSERT INTO wardrobe_items_fts(rowid, item_name) VALUES (new.item_id, new.item_name); END",
+    "CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_delete AFTER DELETE ON wardrobe_items BEGIN "
+    "INSERT INTO wardrobe_items_fts(wardrobe_items_fts, rowid, item_name) "
+    "VALUES ('delete', old.item_id, old.item_name); END",
+    "CREATE TRIGGER IF NOT EXISTS wardrobe_items_fts_update AFTER UPDATE OF item_name ON wardrobe_items BEGIN "
+    "INSERT INTO wardrobe_items_fts(wardrobe_items_fts, rowid, item_name) "
+    "VALUES ('delete', old.item_id, old.item_name); "
+    "INSERT INTO wardrobe_items_fts(rowid, item_name) VALUES (new.item_id, new.item_name); END",
+)
+
+
+@event.listens_for(WardrobeItem.__table__, "after_create")
+def _create_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for ddl in FTS_DDL:
+            connection.exec_driver_sql(ddl)
+
+
+@event.listens_for(WardrobeItem.__table__, "before_drop")
+def _drop_fts(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS wardrobe_items_fts")
+
+
+def ensure_search_index(engine):
+    """Create the FTS table for an existing SQLite database and index its items.
+
+    Returns True if the table had to be created.
+    """
+    if engine.dialect.name != "sqlite":
+        return False
+    with engine.begin() as conn:
+        if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)).first():
+            return False
+        _create_fts(None, conn)
+        conn.exec_driver_sql("INSERT INTO wardrobe_items_fts(wardrobe_items_fts) VALUES ('rebuild')")
+    return True
+
+
+def insert_ignore(model):
+    """INSERT for model that skips rows conflicting with a unique constraint.
+
+    Uses ON CONFLICT DO NOTHING on SQLite and PostgreSQL and INSERT IGNORE on
+    MySQL, so seeding and other idempotent writes are one statement.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(model).on_conflict_do_nothing()
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(model).on_conflict_do_nothing()
+    return db.insert(model).prefix_with("IGNORE")
+
+
+def upsert(model, keys, replace=(), increment=()):
+    """INSERT for model that updates the existing row when keys conflict.
+
+    Columns in replace take the new value; columns in increment are added to
+    the stored value. ON CONFLICT DO UPDATE on SQLite and PostgreSQL, ON
+    DUPLICATE KEY UPDATE on MySQL.
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(model)
+        new = stmt.excluded
+    else:
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(model)
+        new = stmt.inserted
+    values = {name: new[name] for name in replace}
+    values.update({name: getattr(model, name) + new[name] for name in increment})
+    if dialect in ("sqlite", "postgresql"):
+        return stmt.on_conflict_do_update(index_elements=list(keys), set_=values)
+    return stmt.on_duplicate_key_update(values)
+
+
+def bump_data_version(user_ids, items=False):
+    """Increment User.data_version for user_ids (a list or a select of user ids).
+
+    items=True marks a change to the users' wardrobe items or laundry and
+    increments items_version as well. Call it in the transaction that makes
+    the change, before committing, so the new version and the new data become
+    visible together.
+    """
+    values = {"data_version": User.data_version + 1}
+    if items:
+        values["items_version"] = User.items_version + 1
+    db.session.execute(db.update(User).where(User.user_id.in_(user_ids)).values(values))
+
+
+def read_data_version(user_id):
+    """The user's current data_version, or None if there is no such user."""
+    return db.session.scalar(db.select(User.data_version).where(User.user_id == user_id))
+
+
+def read_items_version(user_id):
+    """The user's current items_version, or None if there is no such user."""
+    return db.session.scalar(db.select(User.items_version).where(User.user_id == user_id))
+
+
+def read_versions(user_id):
+    """The user's (data_version, items_version) from one read, or None if there is no such user."""
+    return db.session.execute(
+        db.select(User.data_version, User.items_version).where(User.user_id == user_id)).first()
+
+
+def commit_items_change(user_id):
+    """Bump the user's data and items versions, commit, and return the new items_version.
+
+    The version is read back before the commit, while this transaction still
+    holds the row, so it is exactly the one this commit produced.
+    """
+    bump_data_version([user_id], items=True)
+    version = read_items_version(user_id)
+    db.session.commit()
+    return version
+
+
+def migrate_schema():
+    """Bring an existing database up to the current models.
+
+    Creates missing tables, the search index, columns added to existing tables
+    (which need a default or must be nullable) and any indexes declared in
+    __table_args__ that the database does not have yet. Duplicate laundry rows
+    are removed first so the unique (user_id, item_id) index can be built.
+    Returns the names of the tables, columns and indexes created.
+    """
+    existing_tables = set(db.inspect(db.engine).get_table_names())
+    db.create_all()
+    created = [name for name in db.metadata.tables if name not in existing_tables]
+    if ensure_search_index(db.engine):
+        created.append(FTS_TABLE)
+
+    inspector = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(db.text("ALTER TABLE %s ADD COLUMN %s" % (
+                        conn.dialect.identifier_preparer.format_table(table),
+                        CreateColumn(column).compile(dialect=conn.dialect))))
+                    created.append("%s.%s" % (table.name, column.name))
+
+    keep = (db.select(db.func.min(Laundry.id).label("id"))
+            .group_by(Laundry.user_id, Laundry.item_id)
+            .subquery())
+    db.session.execute(db.delete(Laundry).where(Laundry.id.not_in(db.select(keep.c.id))))
+    db.session.commit()
+
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(db.engine)
+                created.append(index.name)
+    return created
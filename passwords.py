@@ -0,0 +1,84 @@
+"""Password hashing on a small bounded thread pool.
+
+generate_password_hash/check_password_hash are deliberately slow. Running them
+on a pool of PASSWORD_HASH_WORKERS threads caps how much CPU a login burst can
+take from the rest of the app: at most that many hashes run at once per
+process, and once PASSWORD_HASH_QUEUE hashes are in flight further ones fail
+fast with HasherBusy instead of piling up behind them. hashlib releases the
+GIL while hashing, so request threads keep serving other routes meanwhile.
+The pool is started on first use, i.e. in each worker after a pre-fork
+server has forked.
+
+PASSWORD_HASH_METHOD is a werkzeug method string including its work factor
+(e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000"). Stored hashes made with
+other parameters are reported by needs_rehash() so login can upgrade them.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """Too many hashes are already in flight."""
+
+
+class PasswordHasher:
+    def __init__(self, app=None, method="scrypt:32768:8:1", max_workers=2, max_pending=32):
+        self.method = method
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._prefix = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config["PASSWORD_HASH_METHOD"]
+        self.max_workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.max_pending = app.config["PASSWORD_HASH_QUEUE"]
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._prefix = None
+        self.shutdown()
+        app.extensions["password_hasher"] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was not made with the configured method and work factor."""
+        return pwhash.split("$", 1)[0] != self.prefix
+
+    @property
+    def prefix(self):
+        """The "method:params" prefix werkzeug stores for the configured method."""
+        if self._prefix is None:
+            # werkzeug fills in default parameters, so ask it rather than parse
+            self._prefix = generate_password_hash("", self.method).split("$", 1)[0]
+        return self._prefix
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusy()
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="password-hash")
+            return self._executor
@@ -0,0 +1,112 @@
+"""Batch job precomputing every user's outfit of the day.
+
+precompute_daily() splits the users that have no DailyOutfit for the day into
+partitions and hands them to a process pool. Each worker opens its own
+connection and reads the available items of its whole partition with one
+query, then picks one outfit per user; the choice is seeded by (seed, day,
+user) so a rerun picks the same outfits. The parent writes the results in
+batches through suggestions.record_suggestions() together with the
+daily_outfits rows, so /auto and the home page can serve the morning rush
+from precomputed rows. Users already done for the day are skipped, which
+makes the job safe to rerun after a failure.
+"""
+import multiprocessing
+import random
+from collections import defaultdict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from itertools import repeat
+
+from sqlalchemy import create_engine, exists, select
+from sqlalchemy.pool import NullPool
+
+from models import db, User, WardrobeItem, Laundry, OutfitSuggestion, DailyOutfit, insert_ignore, ITEM_CATEGORIES
+from suggestions import record_suggestions
+
+PrecomputeResult = namedtuple("PrecomputeResult", "day users written")
+
+
+def choose_outfit(items_by_category, rng):
+    """Pick (top, bottom, shoes) item rows, matching the top's season when possible.
+
+    Returns None unless every category has an item.
+    """
+    tops, bottoms, shoes = (items_by_category.get(c) for c in ITEM_CATEGORIES)
+    if not tops or not bottoms or not shoes:
+        return None
+    top = rng.choice(tops)
+
+    def pick(items):
+        same_season = [i for i in items if top.season_id and i.season_id == top.season_id]
+        return rng.choice(same_season or items)
+
+    return top, pick(bottoms), pick(shoes)
+
+
+def compute_partition(database_uri, user_ids, day, seed=0):
+    """Return outfit-of-the-day rows for user_ids. Runs in a worker process."""
+    engine = create_engine(database_uri, poolclass=NullPool)
+    in_laundry = exists().where(Laundry.user_id == WardrobeItem.user_id, Laundry.item_id == WardrobeItem.item_id)
+    query = (select(WardrobeItem.user_id, WardrobeItem.item_id, WardrobeItem.category, WardrobeItem.season_id)
+             .where(WardrobeItem.user_id.in_(user_ids), ~in_laundry)
+             .order_by(WardrobeItem.user_id, WardrobeItem.item_id))
+    available = defaultdict(lambda: defaultdict(list))
+    try:
+        with engine.connect() as conn:
+            for row in conn.execute(query):
+                available[row.user_id][row.category].append(row)
+    finally:
+        engine.dispose()
+
+    rows = []
+    for user_id in user_ids:
+        outfit = choose_outfit(available.get(user_id, {}), random.Random("%s:%s:%s" % (seed, day, user_id)))
+        if outfit is not None:
+            top, bottom, shoes = outfit
+            rows.append({"user_id": user_id, "top_item_id": top.item_id,
+                         "bottom_item_id": bottom.item_id, "shoes_item_id": shoes.item_id})
+    return rows
+
+
+def _write(rows, day):
+    suggestions = [OutfitSuggestion(**row) for row in rows]
+    record_suggestions(suggestions, commit=False)
+    db.session.execute(insert_ignore(DailyOutfit), [
+        {"user_id": s.user_id, "day": day, "suggestion_id": s.suggestion_id} for s in suggestions
+    ])
+    db.session.commit()
+    return len(suggestions)
+
+
+def precompute_daily(day=None, workers=None, partition_size=500, batch_size=5000, seed=0):
+    """Precompute the outfit of the day for every user who has none yet.
+
+    workers is the process pool size (None = one per CPU, 0 = compute in this
+    process). Must run inside an app context. Returns a PrecomputeResult.
+    """
+    day = day or datetime.now(timezone.utc).date()
+    done = select(DailyOutfit.user_id).where(DailyOutfit.day == day)
+    user_ids = db.session.scalars(
+        select(User.user_id).where(User.user_id.not_in(done)).order_by(User.user_id)).all()
+    partitions = [user_ids[i:i + partition_size] for i in range(0, len(user_ids), partition_size)]
+    database_uri = db.engine.url.render_as_string(hide_password=False)
+
+    if workers == 0:
+        results = (compute_partition(database_uri, p, day, seed) for p in partitions)
+        return _write_all(results, day, len(user_ids), batch_size)
+    # spawn: do not fork the parent's open connections and threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = pool.map(compute_partition, repeat(database_uri), partitions, repeat(day), repeat(seed))
+        return _write_all(results, day, len(user_ids), batch_size)
+
+
+def _write_all(results, day, users, batch_size):
+    written, pending = 0, []
+    for rows in results:
+        pending.extend(rows)
+        while len(pending) >= batch_size:
+            written += _write(pending[:batch_size], day)
+            pending = pending[batch_size:]
+    if pending:
+        written += _write(pending, day)
+    return PrecomputeResult(day, users, written)
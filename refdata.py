@@ -0,0 +1,87 @@
+"""Per-app cache of the Season and Style reference tables.
+
+The tables hold a handful of static rows, so they are read once into an
+immutable ReferenceData snapshot shared by routes, templates and imports.
+Commits that insert, update or delete a Season or Style drop the snapshot and
+the next access reloads it. reference_data is the current app's cache.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+from flask import current_app
+from sqlalchemy import event
+from werkzeug.local import LocalProxy
+
+from models import db, Season, Style
+
+SeasonRef = namedtuple("SeasonRef", "season_id season_name")
+StyleRef = namedtuple("StyleRef", "style_id style_name")
+
+
+class ReferenceData:
+    """Immutable id<->name lookups for seasons and styles."""
+
+    def __init__(self, seasons, styles):
+        self.seasons = tuple(SeasonRef(*row) for row in seasons)
+        self.styles = tuple(StyleRef(*row) for row in styles)
+        self.season_names = MappingProxyType({s.season_id: s.season_name for s in self.seasons})
+        self.style_names = MappingProxyType({s.style_id: s.style_name for s in self.styles})
+        # keyed by lower-cased name
+        self.season_ids = MappingProxyType({s.season_name.lower(): s.season_id for s in self.seasons})
+        self.style_ids = MappingProxyType({s.style_name.lower(): s.style_id for s in self.styles})
+
+
+class ReferenceCache:
+    def __init__(self, app=None):
+        self._data = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.invalidate()
+        app.extensions["reference_data"] = self
+
+    def get(self):
+        """Return the current snapshot, loading it on first use (needs an app context)."""
+        data = self._data
+        if data is None:
+            with self._lock:
+                if self._data is None:
+                    self._data = self._load()
+                data = self._data
+        return data
+
+    def invalidate(self):
+        self._data = None
+
+    @staticmethod
+    def _load():
+        seasons = (db.session.query(Season.season_id, Season.season_name)
+                   .order_by(Season.season_id).all())
+        styles = (db.session.query(Style.style_id, Style.style_name)
+                  .order_by(Style.style_id).all())
+        return ReferenceData(seasons, styles)
+
+
+reference_data = LocalProxy(lambda: current_app.extensions["reference_data"])
+
+
+@event.listens_for(db.session, "after_flush")
+def _note_reference_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Season, Style)):
+            session.info["reference_data_changed"] = True
+            return
+
+
+@event.listens_for(db.session, "after_commit")
+def _refresh_after_commit(session):
+    if session.info.pop("reference_data_changed", False):
+        reference_data.invalidate()
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("reference_data_changed", None)
@@ -0,0 +1,224 @@
+"""Weighted outfit sampling with recent-suggestion avoidance.
+
+Each user keeps a window of their most recent suggestions, loaded from
+OutfitSuggestion and then updated as new outfits are drawn. The window is
+tagged with the version of the stored history it was loaded at and loaded again
+when that changes, so suggestions saved by other worker processes are avoided
+too. Items are weighted down by how often they appear in that window and drawn
+from alias tables in O(1); outfits already in the window are rejected and
+redrawn.
+"""
+import random
+import threading
+from collections import Counter, OrderedDict, deque
+
+
+class AliasTable:
+    """Vose's alias method: O(n) to build, O(1) per weighted draw."""
+
+    def __init__(self, weights):
+        n = len(weights)
+        if n == 0:
+            raise ValueError("AliasTable needs at least one weight")
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+        self.prob = [0.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.prob)
+
+    def draw(self, rng):
+        i = rng.randrange(len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
+class _UserHistory:
+    def __init__(self, window, outfits, stored_version):
+        self.recent = deque(maxlen=window)
+        self.outfit_counts = Counter()
+        self.item_counts = Counter()
+        self.version = 0
+        # history_version of the stored history the window matches
+        self.stored_version = stored_version
+        # (season_id, style_id) -> (candidates version, history version, tables)
+        self.tables = {}
+        for outfit in outfits:
+            self.record(outfit)
+
+    def record(self, outfit):
+        if len(self.recent) == self.recent.maxlen:
+            self._forget(self.recent[0])
+        self.recent.append(outfit)
+        self.outfit_counts[outfit] += 1
+        for item_id in outfit:
+            if item_id is not None:
+                self.item_counts[item_id] += 1
+        self.version += 1
+
+    def _forget(self, outfit):
+        self.outfit_counts[outfit] -= 1
+        if not self.outfit_counts[outfit]:
+            del self.outfit_counts[outfit]
+        for item_id in outfit:
+            if item_id is not None:
+                self.item_counts[item_id] -= 1
+                if not self.item_counts[item_id]:
+                    del self.item_counts[item_id]
+
+
+class OutfitSampler:
+    """Draws (top, bottom, shoes) outfits per user.
+
+    window is the number of recent suggestions avoided and used for weighting.
+    Alias tables are rebuilt when the candidates change or after refresh_every
+    new suggestions, so a draw does not rescan history or candidates.
+    """
+
+    def __init__(self, app=None, window=20, refresh_every=10, max_tries=20, seed=None, max_users=10000):
+        self.window = window
+        self.refresh_every = refresh_every
+        self.max_tries = max_tries
+        self.max_users = max_users
+        self.rng = random.Random(seed)
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.window = app.config["OUTFIT_HISTORY_WINDOW"]
+        if app.config["OUTFIT_SAMPLER_SEED"] is not None:
+            self.seed(app.config["OUTFIT_SAMPLER_SEED"])
+        self.clear()
+        app.extensions["outfit_sampler"] = self
+
+    def seed(self, seed):
+        with self._lock:
+            self.rng.seed(seed)
+
+    def sample(self, user_id, key, version, history_version, candidates_loader, history_loader, count=1):
+        """Return up to count outfits as (top, bottom, shoes) item tuples.
+
+        key identifies the candidate filter (e.g. season/style) and version
+        changes whenever the user's available items do; history_version
+        changes whenever the user's stored suggestion history does.
+        candidates_loader() returns the three candidate lists in outfit order
+        and history_loader(user_id, window) the user's recent outfits as item
+        id triples, oldest first. Returns [] when a category has no candidates.
+
+        The loaders run without the lock held, so a user's cold load does not
+        hold up sampling for everyone else. Call saved() once the drawn
+        outfits are stored.
+        """
+        history = self._history(user_id, history_loader, history_version)
+        with self._lock:
+            if not self._stale(history.tables.get(key), version, history):
+                return self._draw_outfits(history, key, count)
+        candidate_lists = candidates_loader()
+        with self._lock:
+            # another request may have rebuilt the tables meanwhile
+            if self._stale(history.tables.get(key), version, history):
+                history.tables[key] = (version, history.version, self._build_tables(candidate_lists, history))
+            return self._draw_outfits(history, key, count)
+
+    def recent_item_counts(self, user_id, history_loader, history_version):
+        """Return {item_id: appearances} over the user's recent window."""
+        history = self._history(user_id, history_loader, history_version)
+        with self._lock:
+            return dict(history.item_counts)
+
+    def record(self, user_id, outfits, history_loader, history_version):
+        """Add outfits chosen outside sample() to the user's recent window."""
+        history = self._history(user_id, history_loader, history_version)
+        with self._lock:
+            for outfit in outfits:
+                history.record(tuple(item.item_id for item in outfit))
+
+    def saved(self, user_id, history_version):
+        """Note that the outfits drawn since the window was loaded are stored as history_version.
+
+        The window is kept only when it was exactly one version behind;
+        otherwise another process saved suggestions in between and the window
+        is loaded again on the next call.
+        """
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None or history.stored_version >= history_version:
+                return
+            if history.stored_version == history_version - 1:
+                history.stored_version = history_version
+            else:
+                del self._users[user_id]
+
+    def forget(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def _history(self, user_id, history_loader, history_version):
+        """Return the user's history as of history_version, loading it on a miss.
+
+        Call without the lock held.
+        """
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is not None and history.stored_version == history_version:
+                self._users.move_to_end(user_id)
+                return history
+        outfits = history_loader(user_id, self.window)
+        with self._lock:
+            history = self._users.get(user_id)
+            if history is None or history.stored_version != history_version:
+                history = _UserHistory(self.window, outfits, history_version)
+                self._users[user_id] = history
+                while len(self._users) > self.max_users:
+                    self._users.popitem(last=False)
+            return history
+
+    def _stale(self, cached, version, history):
+        return (cached is None or cached[0] != version
+                or history.version - cached[1] >= self.refresh_every)
+
+    def _draw_outfits(self, history, key, count):
+        tables = history.tables[key][2]
+        if not all(tables):
+            return []
+        outfits = []
+        for _ in range(count):
+            outfit = self._draw(tables, history)
+            history.record(tuple(item.item_id for item in outfit))
+            outfits.append(outfit)
+        return outfits
+
+    @staticmethod
+    def _build_tables(candidate_lists, history):
+        tables = []
+        for items in candidate_lists:
+            if not items:
+                tables.append(None)
+                continue
+            weights = [1.0 / (1 + history.item_counts.get(item.item_id, 0)) for item in items]
+            tables.append((items, AliasTable(weights)))
+        return tables
+
+    def _draw(self, tables, history):
+        outfit = None
+        for _ in range(self.max_tries):
+            outfit = tuple(items[alias.draw(self.rng)] for items, alias in tables)
+            if tuple(item.item_id for item in outfit) not in history.outfit_counts:
+                break
+        return outfit
@@ -0,0 +1,85 @@
+"""Compatibility scoring of every top x bottom x shoes combination.
+
+Items are reduced to small feature arrays (season id, style id, recent
+suggestion count) and all combinations are scored at once with NumPy
+broadcasting; the best k are picked with a partial sort. NumPy is optional:
+HAS_NUMPY is False when it is not installed and top_k_outfits() raises.
+NumPy itself is only imported on first use, keeping worker startup fast.
+"""
+import importlib.util
+import random
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+# score contributions; matches are counted per pair of items in the outfit
+SEASON_MATCH = 1.0
+STYLE_MATCH = 1.0
+RECENCY_PENALTY = 0.5
+# larger candidate sets are randomly subsampled to stay within this many
+# combinations (about 8 MB of float32 scores)
+MAX_COMBINATIONS = 2000000
+
+
+def _features(items, recent_counts):
+    """Season ids, style ids (0 = unset) and recency counts of items as arrays."""
+    import numpy as np
+    season = np.fromiter((i.season_id or 0 for i in items), dtype=np.int32, count=len(items))
+    style = np.fromiter((i.style_id or 0 for i in items), dtype=np.int32, count=len(items))
+    recency = np.fromiter((recent_counts.get(i.item_id, 0) for i in items), dtype=np.float32, count=len(items))
+    return season, style, recency
+
+
+def _pair_matches(a, b):
+    """1.0 where two items share a set attribute, else 0.0, for every pair."""
+    import numpy as np
+    return ((a[:, None] == b[None, :]) & (a[:, None] != 0)).astype(np.float32)
+
+
+def score_outfits(tops, bottoms, shoes, recent_counts=None):
+    """Return a (len(tops), len(bottoms), len(shoes)) array of outfit scores."""
+    if not HAS_NUMPY:
+        raise RuntimeError("NumPy is required for outfit scoring")
+    recent_counts = recent_counts or {}
+    t_season, t_style, t_recent = _features(tops, recent_counts)
+    b_season, b_style, b_recent = _features(bottoms, recent_counts)
+    s_season, s_style, s_recent = _features(shoes, recent_counts)
+
+    tb = SEASON_MATCH * _pair_matches(t_season, b_season) + STYLE_MATCH * _pair_matches(t_style, b_style)
+    ts = SEASON_MATCH * _pair_matches(t_season, s_season) + STYLE_MATCH * _pair_matches(t_style, s_style)
+    bs = SEASON_MATCH * _pair_matches(b_season, s_season) + STYLE_MATCH * _pair_matches(b_style, s_style)
+
+    scores = tb[:, :, None] + ts[:, None, :]
+    scores += bs[None, :, :]
+    scores -= RECENCY_PENALTY * t_recent[:, None, None]
+    scores -= RECENCY_PENALTY * b_recent[None, :, None]
+    scores -= RECENCY_PENALTY * s_recent[None, None, :]
+    return scores
+
+
+def _subsample(groups, max_combinations, rng):
+    """Shrink each candidate list by the same factor until the product fits."""
+    total = 1
+    for items in groups:
+        total *= len(items)
+    if total <= max_combinations:
+        return groups
+    factor = (max_combinations / float(total)) ** (1.0 / len(groups))
+    return [rng.sample(items, max(1, int(len(items) * factor))) for items in groups]
+
+
+def top_k_outfits(tops, bottoms, shoes, k=1, recent_counts=None, max_combinations=MAX_COMBINATIONS, rng=random):
+    """Return up to k best (top, bottom, shoes) outfits, highest score first.
+
+    recent_counts maps item_id to how often it was suggested recently.
+    """
+    if not tops or not bottoms or not shoes or k <= 0:
+        return []
+    tops, bottoms, shoes = _subsample([tops, bottoms, shoes], max_combinations, rng)
+    scores = score_outfits(tops, bottoms, shoes, recent_counts).ravel()
+    import numpy as np
+
+    k = min(k, scores.size)
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best], kind="stable")]
+    t_idx, b_idx, s_idx = np.unravel_index(best, (len(tops), len(bottoms), len(shoes)))
+    return [(tops[t], bottoms[b], shoes[s]) for t, b, s in zip(t_idx.tolist(), b_idx.tolist(), s_idx.tolist())]
@@ -0,0 +1,109 @@
+"""Item search over names with category/season/style facet counts.
+
+search_items() answers a search in one statement. A CTE selects the user's
+items that match the text and are not in Laundry. UNION ALL branches over it
+return the page of results and the counts per category, season and style. Each
+facet ignores its own filter, so it shows how many results picking another
+value would give.
+
+Text matching uses the FTS5 index from models.FTS_DDL on SQLite (every word
+is a prefix term, results ranked by bm25) and falls back to LIKE with
+item_id order on other databases.
+"""
+from collections import namedtuple
+
+from sqlalchemy import Float, Integer, String, and_, cast, column, literal, null, select, table, true, union_all
+
+from availability import AvailableItem
+from models import db, WardrobeItem, Laundry, FTS_TABLE
+
+SearchResult = namedtuple("SearchResult", "items total facets")
+
+FACETS = (
+    ("category", "category"),
+    ("season", "season_id"),
+    ("style", "style_id"),
+)
+
+_fts = table(FTS_TABLE, column("rowid"), column("item_name"), column("rank"))
+
+
+def fts_query(text):
+    """FTS5 MATCH expression requiring every word of text as a prefix."""
+    return " ".join('"%s"*' % word.replace('"', '""') for word in text.split())
+
+
+def _matches(user_id, text):
+    """CTE of the user's available items matching text, with a rank column."""
+    in_laundry = select(Laundry.item_id).where(Laundry.user_id == user_id)
+    query = select(WardrobeItem.item_id, WardrobeItem.item_name, WardrobeItem.category,
+                   WardrobeItem.image_url, WardrobeItem.season_id, WardrobeItem.style_id)
+    words = text.split() if text else []
+    if words and db.session.get_bind().dialect.name == "sqlite":
+        # run the MATCH once up front; as a plain join SQLite may instead
+        # repeat it for every item of the user
+        hits = (select(_fts.c.rowid.label("item_id"), _fts.c.rank.label("rank"))
+                .where(_fts.c.item_name.op("MATCH")(fts_query(text)))
+                .cte("hits").prefix_with("MATERIALIZED"))
+        query = (query.add_columns(hits.c.rank)
+                 .select_from(hits)
+                 .join(WardrobeItem, WardrobeItem.item_id == hits.c.item_id))
+    else:
+        query = query.add_columns(cast(literal(0), Float).label("rank"))
+        for word in words:
+            query = query.where(WardrobeItem.item_name.icontains(word, autoescape=True))
+    return (query.where(WardrobeItem.user_id == user_id, WardrobeItem.item_id.not_in(in_laundry))
+            .cte("matches"))
+
+
+def search_items(user_id, text=None, category=None, season_id=None, style_id=None, limit=100):
+    """Return a SearchResult for the user's available items matching text.
+
+    items are the best `limit` matches as AvailableItem, total is the number of
+    matches with all filters applied, and facets maps "category", "season" and
+    "style" to {value: count} (None counts items without a season/style).
+    """
+    matches = _matches(user_id, text)
+    filters = {"category": category, "season_id": season_id, "style_id": style_id}
+
+    def where(skip=None):
+        clauses = [matches.c[name] == value for name, value in filters.items()
+                   if value is not None and name != skip]
+        return and_(true(), *clauses)
+
+    def blank(name, type_):
+        return cast(null(), type_).label(name)
+
+    page = (select(literal("item").label("kind"), blank("n", Integer), matches.c.rank,
+                   matches.c.item_id, matches.c.item_name, matches.c.category,
+                   matches.c.image_url, matches.c.season_id, matches.c.style_id)
+            .where(where())
+            .order_by(matches.c.rank, matches.c.item_id)
+            .limit(limit)
+            .subquery())
+    branches = [select(*page.c)]
+    for kind, name in FACETS:
+        key = matches.c[name]
+        branches.append(
+            select(literal(kind).label("kind"), db.func.count().label("n"), blank("rank", Float),
+                   blank("item_id", Integer), blank("item_name", String),
+                   key if name == "category" else blank("category", String),
+                   blank("image_url", String),
+                   key if name == "season_id" else blank("season_id", Integer),
+                   key if name == "style_id" else blank("style_id", Integer))
+            .where(where(skip=name))
+            .group_by(key))
+
+    items, facets = [], {kind: {} for kind, _ in FACETS}
+    for row in db.session.execute(union_all(*branches)):
+        if row.kind == "item":
+            items.append(row)
+        else:
+            name = dict(FACETS)[row.kind]
+            facets[row.kind][getattr(row, name)] = row.n
+    items.sort(key=lambda r: (r.rank, r.item_id))
+
+    total = sum(n for value, n in facets["category"].items() if category is None or value == category)
+    items = [AvailableItem(r.item_id, r.item_name, r.category, r.image_url, r.season_id, r.style_id)
+             for r in items]
+    return SearchResult(items, total, facets)
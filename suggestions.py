@@ -0,0 +1,152 @@
+"""Writes, retention and rollups for OutfitSuggestion history.
+
+Every suggestion goes through record_suggestions(), which in the same
+transaction moves the user's LatestSuggestion pointer (so the home page reads
+one row instead of sorting the history) and adds to the daily rollups:
+SuggestionItemRollup (per item) and SuggestionFilterRollup (per season/style
+filter). Analytics can read the rollups without scanning raw history, and
+they are kept when prune_suggestions() deletes raw rows older than
+SUGGESTION_RETENTION_DAYS.
+
+rebuild_latest() and rebuild_rollups() recompute both from the raw rows, for
+databases that predate them or were filled by bulk inserts.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from models import db, OutfitSuggestion, LatestSuggestion, DailyOutfit, SuggestionItemRollup, SuggestionFilterRollup, upsert, bump_data_version
+
+
+def record_suggestions(suggestions, commit=True):
+    """Insert new OutfitSuggestion objects, update pointers and rollups, and commit.
+
+    suggestions may belong to several users; the last one of each user becomes
+    that user's latest. With commit=False the caller commits, e.g. to write
+    rows referencing the new suggestions in the same transaction.
+    """
+    if not suggestions:
+        return suggestions
+    now = datetime.now(timezone.utc)
+    for s in suggestions:
+        if s.created_at is None:
+            s.created_at = now
+    db.session.add_all(suggestions)
+    db.session.flush()
+
+    latest, items, filters = {}, Counter(), Counter()
+    for s in suggestions:
+        day = s.created_at.date()
+        latest[s.user_id] = s.suggestion_id
+        filters[day, s.user_id, s.season_id or 0, s.style_id or 0] += 1
+        for item_id in (s.top_item_id, s.bottom_item_id, s.shoes_item_id):
+            if item_id is not None:
+                items[day, s.user_id, item_id] += 1
+
+    db.session.execute(upsert(LatestSuggestion, ["user_id"], replace=["suggestion_id"]),
+                       [{"user_id": u, "suggestion_id": s} for u, s in latest.items()])
+    db.session.execute(upsert(SuggestionItemRollup, ["day", "user_id", "item_id"], increment=["count"]),
+                       [{"day": d, "user_id": u, "item_id": i, "count": n} for (d, u, i), n in items.items()])
+    db.session.execute(upsert(SuggestionFilterRollup, ["day", "user_id", "season_id", "style_id"],
+                              increment=["count"]),
+                       [{"day": d, "user_id": u, "season_id": se, "style_id": st, "count": n}
+                        for (d, u, se, st), n in filters.items()])
+    bump_data_version(list(latest))
+    if commit:
+        db.session.commit()
+    return suggestions
+
+
+def prune_suggestions(older_than, batch_size=5000):
+    """Delete suggestions created before older_than in batches; returns how many.
+
+    Each batch is its own transaction so writers are not blocked for long.
+    Suggestions that are a user's latest are kept; outfits of the day from
+    before older_than are deleted with their suggestions.
+    """
+    db.session.execute(db.delete(DailyOutfit).where(DailyOutfit.day < older_than.date()))
+    db.session.commit()
+    pinned = db.union(db.select(LatestSuggestion.suggestion_id), db.select(DailyOutfit.suggestion_id))
+    total = 0
+    while True:
+        batch = (db.select(OutfitSuggestion.suggestion_id, OutfitSuggestion.user_id)
+                 .where(OutfitSuggestion.created_at < older_than,
+                        OutfitSuggestion.suggestion_id.not_in(pinned))
+                 .order_by(OutfitSuggestion.created_at)
+                 .limit(batch_size))
+        rows = db.session.execute(batch).all()
+        if not rows:
+            return total
+        ids = [row.suggestion_id for row in rows]
+        db.session.execute(db.delete(OutfitSuggestion).where(OutfitSuggestion.suggestion_id.in_(ids)))
+        bump_data_version(sorted({row.user_id for row in rows}))
+        db.session.commit()
+        total += len(ids)
+
+
+def start_pruning(app, interval):
+    """Prune per SUGGESTION_RETENTION_DAYS every interval seconds in a daemon thread.
+
+    For a multi-worker deployment run the prune-suggestions command from cron
+    instead, so the job runs once rather than in every worker.
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    days = app.config["SUGGESTION_RETENTION_DAYS"]
+                    prune_suggestions(datetime.now(timezone.utc) - timedelta(days=days),
+                                      app.config["SUGGESTION_PRUNE_BATCH"])
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Pruning outfit suggestions failed")
+
+    thread = threading.Thread(target=run, name="suggestion-pruner", daemon=True)
+    thread.start()
+    return thread
+
+
+def _day(column):
+    if db.session.get_bind().dialect.name == "sqlite":
+        return db.func.date(column)
+    return db.cast(column, db.Date)
+
+
+def rebuild_latest():
+    """Recompute every user's LatestSuggestion from the raw history."""
+    newest = (db.select(OutfitSuggestion.user_id, db.func.max(OutfitSuggestion.suggestion_id))
+              .group_by(OutfitSuggestion.user_id))
+    db.session.execute(db.delete(LatestSuggestion))
+    db.session.execute(db.insert(LatestSuggestion).from_select(["user_id", "suggestion_id"], newest))
+    db.session.commit()
+
+
+def rebuild_rollups():
+    """Recompute both rollup tables from the raw history.
+
+    Rollups for days whose raw rows were already pruned are lost, so this is
+    meant for backfilling, not routine use.
+    """
+    day = _day(OutfitSuggestion.created_at)
+    slots = db.union_all(*(
+        db.select(day.label("day"), OutfitSuggestion.user_id, column.label("item_id"))
+        .where(column.is_not(None))
+        for column in (OutfitSuggestion.top_item_id, OutfitSuggestion.bottom_item_id,
+                       OutfitSuggestion.shoes_item_id)
+    )).subquery()
+    db.session.execute(db.delete(SuggestionItemRollup))
+    db.session.execute(db.insert(SuggestionItemRollup).from_select(
+        ["day", "user_id", "item_id", "count"],
+        db.select(slots.c.day, slots.c.user_id, slots.c.item_id, db.func.count())
+        .group_by(slots.c.day, slots.c.user_id, slots.c.item_id)))
+
+    season = db.func.coalesce(OutfitSuggestion.season_id, 0)
+    style = db.func.coalesce(OutfitSuggestion.style_id, 0)
+    db.session.execute(db.delete(SuggestionFilterRollup))
+    db.session.execute(db.insert(SuggestionFilterRollup).from_select(
+        ["day", "user_id", "season_id", "style_id", "count"],
+        db.select(day, OutfitSuggestion.user_id, season, style, db.func.count())
+        .group_by(day, OutfitSuggestion.user_id, season, style)))
+    db.session.commit()
@@ -0,0 +1,84 @@
+"""Fixtures for apps on temporary SQLite databases filled by bench.synthetic."""
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, seed_basic_data  # noqa: E402
+from bench.synthetic import seed_synthetic  # noqa: E402
+from models import db, migrate_schema  # noqa: E402
+
+# cheap hashes: the tests log in through the session, not the password
+PASSWORD_METHOD = "pbkdf2:sha256:1000"
+# settings copied to a second app on the same database
+WORKER_CONFIG = ("TESTING", "SQLALCHEMY_DATABASE_URI", "PASSWORD_HASH_METHOD", "OUTFIT_SAMPLER_SEED",
+                 "MEDIA_ROOT", "THUMBNAIL_WORKERS")
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factory: make_app(items_per_user, users) -> (app, user ids), each on its own database."""
+    apps = []
+
+    def make(items_per_user=50, users=2, suggestions_per_user=10):
+        path = tmp_path / ("app%d.db" % len(apps))
+        app = create_app({
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///%s" % path,
+            "PASSWORD_HASH_METHOD": PASSWORD_METHOD,
+            "OUTFIT_SAMPLER_SEED": 0,
+            "MEDIA_ROOT": str(tmp_path / "media"),
+            "THUMBNAIL_WORKERS": 0,
+        })
+        with app.app_context():
+            migrate_schema()
+            seed_basic_data()
+            user_ids = seed_synthetic(users=users, items_per_user=items_per_user,
+                                      suggestions_per_user=suggestions_per_user, password_method=PASSWORD_METHOD)
+        apps.append(app)
+        return app, user_ids
+
+    yield make
+    for app in apps:
+        app.extensions["password_hasher"].shutdown()
+        with app.app_context():
+            db.engine.dispose()
+
+
+@pytest.fixture
+def client_for():
+    """client_for(app, user_id) -> a test client logged in as that user."""
+    def make(app, user_id):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["user_id"] = user_id
+        return client
+    return make
+
+
+@pytest.fixture
+def workers(make_app, client_for):
+    """Two apps on the same database, like two worker processes, and a client of each for one user."""
+    app_a, user_ids = make_app(items_per_user=30)
+    app_b = create_app({name: app_a.config[name] for name in WORKER_CONFIG})
+    yield client_for(app_a, user_ids[0]), client_for(app_b, user_ids[0])
+    app_b.extensions["password_hasher"].shutdown()
+    with app_b.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def sql_statements():
+    """(statement, parameters, executemany) for every statement run during the test."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters, executemany))
+
+    event.listen(Engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(Engine, "before_cursor_execute", record)
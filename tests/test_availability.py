@@ -0,0 +1,26 @@
+"""Availability index entries across two workers (apps) on one database."""
+import re
+
+
+def wardrobe_ids(client):
+    return {int(item_id) for item_id in re.findall(r'name="item_ids" value="(\d+)"', client.get("/wardrobe").text)}
+
+
+def item_loads(sql_statements):
+    return [statement for statement, _, _ in sql_statements if "FROM wardrobe_items" in statement]
+
+
+def test_suggestions_from_another_worker_keep_the_entry(workers, sql_statements):
+    client_a, client_b = workers
+    wardrobe_ids(client_a)
+    assert client_b.post("/auto", data={"count": 3}).status_code == 200
+    sql_statements.clear()
+    wardrobe_ids(client_a)
+    assert item_loads(sql_statements) == []
+
+
+def test_laundry_from_another_worker_reloads_the_entry(workers):
+    client_a, client_b = workers
+    item_id = min(wardrobe_ids(client_a))
+    client_b.get("/laundry/%d" % item_id)
+    assert item_id not in wardrobe_ids(client_a)
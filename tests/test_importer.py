@@ -0,0 +1,37 @@
+"""Import errors are reported at the line that caused them."""
+import io
+
+import pytest
+
+from importer import decode_lines, import_items
+
+HEADER = b"item_name,category,image_url\n"
+
+
+@pytest.fixture
+def user(make_app):
+    app, user_ids = make_app(items_per_user=0, users=1, suggestions_per_user=0)
+    with app.app_context():
+        yield user_ids[0]
+
+
+def run_import(user_id, data, fmt="csv"):
+    return import_items(user_id, decode_lines(io.BytesIO(data)), fmt)
+
+
+@pytest.mark.parametrize("data, imported, line_no", [
+    (HEADER + b"\xff\xfe,top,u\n", 0, 2),
+    (HEADER + b"shirt,top,u\n\"two\nlines\",top,u\n\xff,top,u\n", 2, 5),
+    (b'{"item_name": "shirt", "category": "top", "image_url": "u"}\n\xff\n', 1, 2),
+])
+def test_undecodable_line(user, data, imported, line_no):
+    result = run_import(user, data, "jsonl" if data.startswith(b"{") else "csv")
+    assert result.imported == imported
+    assert [line for line, _ in result.errors] == [line_no]
+
+
+def test_csv_error_line(user):
+    # longer than csv.field_size_limit()
+    result = run_import(user, HEADER + b"shirt,top,u\n" + b"x" * 200000 + b",top,u\nshoe,shoes,u\n")
+    assert result.imported == 1
+    assert [line for line, _ in result.errors] == [3]
@@ -0,0 +1,18 @@
+"""Metrics of streamed pages include what runs while the body is generated."""
+import re
+
+
+def metric(client, name, endpoint):
+    text = client.get("/metrics").text
+    return float(re.search(r'^vdrobe_%s\{endpoint="%s"\} (\S+)$' % (name, re.escape(endpoint)), text, re.M).group(1))
+
+
+def test_streamed_page_is_counted_when_closed(make_app, client_for):
+    # a full page, at least TEMPLATE_STREAM_MIN_ITEMS items, is streamed
+    app, user_ids = make_app(items_per_user=300)
+    client = client_for(app, user_ids[0])
+    response = client.get("/wardrobe")
+    response.get_data()
+    response.close()
+    assert metric(client, "request_duration_seconds_count", "main.wardrobe") == 1
+    assert metric(client, "template_seconds_total", "main.wardrobe") > 0
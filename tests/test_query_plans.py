@@ -0,0 +1,112 @@
+"""The routes' queries must be answered through indexes (EXPLAIN QUERY PLAN)."""
+import re
+
+import pytest
+
+from app import get_latest_suggestion, load_available_items
+from models import db, Laundry, WardrobeItem
+
+# a handful of rows, read once into refdata
+SMALL_TABLES = {"seasons", "styles"}
+
+ROUTES = [
+    ("GET", "/"),
+    ("GET", "/wardrobe"),
+    ("GET", "/wardrobe?category=top&season_id=1"),
+    ("GET", "/wardrobe?stream=1"),
+    ("GET", "/laundry"),
+    ("GET", "/auto"),
+    ("POST", "/auto"),
+    ("GET", "/search?q=top"),
+    ("GET", "/outfits"),
+    ("GET", "/api/wardrobe"),
+    ("GET", "/api/laundry"),
+    ("GET", "/api/suggestions"),
+    ("GET", "/laundry/{available}"),
+    ("POST", "/laundry/bulk"),
+    ("GET", "/restore/{in_laundry}"),
+    ("POST", "/restore/all"),
+    ("POST", "/delete/{available}"),
+]
+
+
+def query_plan(statement, parameters):
+    with db.engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def full_scans(plan):
+    """Plan lines that read a whole table without an index."""
+    tables = set(db.metadata.tables)
+    scans = []
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match is None or "USING" in detail or "VIRTUAL TABLE" in detail:
+            continue
+        # aliased tables show up as <table>_<n>; CTEs and subqueries are not tables
+        name = match.group(1)
+        table = name if name in tables else re.sub(r"_\d+$", "", name)
+        if table in tables and table not in SMALL_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def plans(statements):
+    """(statement, plan) for the reads, updates and deletes among captured statements."""
+    return [(statement, query_plan(statement, parameters))
+            for statement, parameters, executemany in statements
+            if not executemany and statement.split(None, 1)[0].upper() in ("SELECT", "WITH", "UPDATE", "DELETE")]
+
+
+@pytest.mark.parametrize("method,path", ROUTES)
+def test_route_queries_use_indexes(make_app, client_for, sql_statements, method, path):
+    app, user_ids = make_app(items_per_user=200)
+    user_id = user_ids[0]
+    with app.app_context():
+        in_laundry = db.session.scalars(db.select(Laundry.item_id).where(Laundry.user_id == user_id)).first()
+        available = load_available_items(user_id)[0].item_id
+    client = client_for(app, user_id)
+    path = path.format(available=available, in_laundry=in_laundry)
+    data = {"count": 3, "item_ids": [available]} if method == "POST" else None
+
+    sql_statements.clear()
+    response = client.open(path, method=method, data=data)
+    response.get_data()
+    assert response.status_code in (200, 302)
+
+    with app.app_context():
+        for statement, plan in plans(sql_statements):
+            assert not full_scans(plan), "%s\n%s" % (statement, "\n".join(plan))
+
+
+def test_available_items_use_user_indexes(make_app, sql_statements):
+    # the NOT IN (laundry) query behind the availability index
+    app, user_ids = make_app()
+    with app.app_context():
+        sql_statements.clear()
+        load_available_items(user_ids[0])
+        [(statement, plan)] = plans(sql_statements)
+    assert any(re.match(r"SEARCH wardrobe_items USING INDEX ix_wardrobe_items_user_\w+ \(user_id=\?", d)
+               for d in plan), plan
+    assert any("SEARCH laundry USING COVERING INDEX uq_laundry_user_item" in d for d in plan), plan
+
+
+def test_latest_suggestion_is_primary_key_lookups(make_app, sql_statements):
+    app, user_ids = make_app()
+    with app.app_context():
+        sql_statements.clear()
+        assert get_latest_suggestion(user_ids[0]) is not None
+        [(statement, plan)] = plans(sql_statements)
+    assert plan and all(d.startswith("SEARCH ") and "PRIMARY KEY" in d for d in plan), plan
+
+
+def test_laundry_by_item_uses_item_index(make_app, sql_statements):
+    # delete_item() clears the laundry entries of the item it deletes
+    app, user_ids = make_app()
+    with app.app_context():
+        item_id = db.session.scalars(db.select(WardrobeItem.item_id)).first()
+        sql_statements.clear()
+        Laundry.query.filter_by(item_id=item_id).delete()
+        db.session.rollback()
+        [(statement, plan)] = plans(sql_statements)
+    assert any("USING INDEX ix_laundry_item (item_id=?)" in d for d in plan), plan
@@ -0,0 +1,33 @@
+"""The sampler's recent-suggestion window across two workers (apps) on one database."""
+from app import load_recent_outfits
+
+
+def recent_window(client):
+    """(the worker's window, the stored window) for the client's user."""
+    app = client.application
+    with client.session_transaction() as session:
+        user_id = session["user_id"]
+    history = app.extensions["outfit_sampler"]._users[user_id]
+    with app.app_context():
+        return list(history.recent), load_recent_outfits(user_id, app.config["OUTFIT_HISTORY_WINDOW"])
+
+
+def test_window_includes_other_workers_suggestions(workers):
+    client_a, client_b = workers
+    client_a.post("/auto", data={"count": 2})
+    client_b.post("/auto", data={"count": 3})
+    client_a.post("/auto", data={"count": 1})
+    window, stored = recent_window(client_a)
+    assert window == stored
+
+
+def test_own_suggestions_keep_the_window(workers, sql_statements):
+    client_a, _ = workers
+    client_a.post("/auto", data={"count": 2})
+    sql_statements.clear()
+    client_a.post("/auto", data={"count": 2})
+    # no reload of the window from outfit_suggestions
+    assert not [statement for statement, _, _ in sql_statements
+                if "FROM outfit_suggestions" in statement and "ORDER BY" in statement]
+    window, stored = recent_window(client_a)
+    assert window == stored
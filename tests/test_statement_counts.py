@@ -0,0 +1,30 @@
+"""Routes run the same number of SQL statements however large the wardrobe is."""
+ROUTES = [
+    ("GET", "/"),
+    ("GET", "/wardrobe"),
+    ("GET", "/laundry"),
+    ("GET", "/auto"),
+    ("POST", "/auto"),
+]
+
+
+def statement_counts(make_app, client_for, sql_statements, items_per_user):
+    """{(method, path): [cold count, warm count]} for the first user."""
+    app, user_ids = make_app(items_per_user=items_per_user)
+    client = client_for(app, user_ids[0])
+    counts = {}
+    # twice: first with cold caches, then served from the availability index
+    for method, path in ROUTES * 2:
+        sql_statements.clear()
+        response = client.open(path, method=method, data={"count": 3} if method == "POST" else None)
+        response.get_data()
+        assert response.status_code == 200, (method, path)
+        counts.setdefault((method, path), []).append(len(sql_statements))
+    return counts
+
+
+def test_statement_counts_do_not_grow_with_wardrobe(make_app, client_for, sql_statements):
+    small = statement_counts(make_app, client_for, sql_statements, items_per_user=20)
+    # more than WARDROBE_PAGE_SIZE and TEMPLATE_STREAM_MIN_ITEMS, so the grids page and stream
+    large = statement_counts(make_app, client_for, sql_statements, items_per_user=600)
+    assert small == large